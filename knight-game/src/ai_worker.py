@@ -0,0 +1,102 @@
+# Runs the AI search in a separate process so the render loop keeps
+# drawing frames and handling events while the AI thinks. The search is
+# pure Python, so on a thread it would hold the GIL against the renderer.
+#
+# The worker process is started on the first AI move and keeps its own
+# searchers between moves, so transposition tables, MCTS trees and solved
+# endgames carry over from move to move as before. Searches report to the
+# worker's instruments; the counters and the search event are passed back
+# with the result and added to the game's.
+
+import itertools
+import time
+
+from engine.instrument import instruments
+
+_executor = None
+# Id of the newest cancelled task, shared with the worker. Tasks run one
+# at a time in the order they are started, so every task up to that id is
+# stale.
+_cancelled = None
+_task_ids = itertools.count(1)
+
+
+def _init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+    # A forked worker inherits the game's sink file; only the game writes it
+    instruments.sink = None
+
+# The stop event the searchers poll, backed by the shared cancelled id
+class _TaskStop():
+    def __init__(self, task_id):
+        self.task_id = task_id
+
+    def is_set(self):
+        return _cancelled.value >= self.task_id
+
+def _search(task_id, make_searcher, state, time_limit, field, instrument):
+    if _cancelled.value >= task_id:
+        return None, None
+    instruments.reset()
+    instruments.enabled = instrument
+    result = make_searcher(state.board).search(state, time_limit=time_limit, field=field, stop=_TaskStop(task_id))
+    report = None
+    if instrument:
+        report = (dict(instruments.counters), instruments.last.get("search"))
+    return result, report
+
+def _get_executor():
+    global _executor, _cancelled
+    if _executor is None:
+        # Imported on the first AI move to keep them out of the game's startup
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _cancelled = multiprocessing.Value("q", 0)
+        _executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(_cancelled,))
+    return _executor
+
+# Stop any running search and the worker process
+def shutdown():
+    global _executor
+    if _executor is not None:
+        with _cancelled.get_lock():
+            _cancelled.value = max(_cancelled.value, next(_task_ids))
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+# One pending AI move. Poll done() once per frame, then read result().
+# `make_searcher` is called with the board in the worker process and must
+# be picklable, e.g. a module-level function or a functools.partial of one.
+class AIMoveTask():
+    def __init__(self, make_searcher, state, time_limit=None, field=None):
+        self.id = next(_task_ids)
+        self.started = time.perf_counter()
+        self.future = _get_executor().submit(_search, self.id, make_searcher, state.copy(), time_limit, field,
+                                             instruments.enabled)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        result, report = self.future.result()
+        if report is not None and instruments.enabled:
+            counters, search = report
+            for name, amount in counters.items():
+                instruments.count(name, amount)
+            if search is not None:
+                instruments.observe(f"search.{search['engine']}", search["ms"])
+                instruments.event("search", **search)
+        return result
+
+    # Seconds since the task was started, including any wait for the worker
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    # Ask the search to stop. It returns at its next budget check, and any
+    # result it produces is ignored by the caller.
+    def cancel(self):
+        with _cancelled.get_lock():
+            _cancelled.value = max(_cancelled.value, self.id)
+        self.future.cancel()
@@ -0,0 +1,69 @@
+import pygame
+
+# Central cache for fonts, images and sounds. Every asset is loaded from
+# disk once and then served from memory. Images are converted to the
+# display's pixel format so blits don't convert them on every frame. The
+# mixer is only started when the first sound is loaded.
+class AssetCache():
+    def __init__(self, base_dir="asset", default_font="font1.ttf"):
+        self.base_dir = base_dir
+        self.default_font = default_font
+        self.fonts = {}
+        self.images = {}
+        self.sounds = {}
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, name):
+        return f"{self.base_dir}/{name}"
+
+    def font(self, size, name=None):
+        key = (name or self.default_font, size)
+        font = self.fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            return font
+        self.misses += 1
+        font = pygame.font.Font(self.path(key[0]), size)
+        self.fonts[key] = font
+        return font
+
+    # `alpha` keeps per-pixel transparency (convert_alpha), otherwise the
+    # image is converted to an opaque surface (convert)
+    def image(self, name, alpha=True):
+        key = (name, alpha)
+        image = self.images.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = pygame.image.load(self.path(name))
+        # Conversion needs a display mode to be set
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if alpha else image.convert()
+        self.images[key] = image
+        return image
+
+    def sound(self, name):
+        sound = self.sounds.get(name)
+        if sound is not None:
+            self.hits += 1
+            return sound
+        self.misses += 1
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        sound = pygame.mixer.Sound(self.path(name))
+        self.sounds[name] = sound
+        return sound
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fonts": len(self.fonts),
+            "images": len(self.images),
+            "sounds": len(self.sounds),
+        }
+
+
+assets = AssetCache()
@@ -0,0 +1,352 @@
+# Benchmarks for the engine and rendering hot paths
+#
+# Times move generation, move validation, A*, minimax at several depths and
+# board rendering over a fixed corpus of mid-game positions, a frame and a
+# move of the play scene, the pathfinding and search on larger boards, leaf
+# evaluation one at a time and batched with NumPy (when installed), plus
+# the startup time of the engine package and of the game window. Results are written as JSON and
+# can be compared against a stored baseline:
+#
+#   python benchmark.py --save baseline.json
+#   python benchmark.py --baseline baseline.json --threshold 0.2
+#
+# The run exits with status 1 when any benchmark is slower than its
+# baseline by more than the threshold, or when a benchmark with a budget
+# goes over it by more than the threshold: the frame interval while the AI
+# is thinking, and time-limited searches on large boards. Rendering uses
+# the dummy SDL video driver, so no window is needed.
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+GAME_DIR = os.path.dirname(SRC_DIR)
+
+from engine import rules
+from engine.board import DEFAULT_BOARD, PLAYER, get_board, squares
+from engine.pathfind import DistanceField
+from engine.openings import random_start
+from engine.search import evaluate
+
+try:
+    from engine import batch
+except ImportError:  # NumPy is not installed
+    batch = None
+
+CORPUS_SEED = 20240601
+CORPUS_SIZE = 24
+MINIMAX_DEPTHS = (2, 4, 6)
+LARGE_BOARD_SIZES = (16, 32, 100)
+BATCH_SIZE = 4096
+AI_THINKING_FRAMES = 120
+SEARCH_TIME_LIMIT = 0.05
+
+
+# Fixed set of mid-game positions: random openings followed by 4 to 12
+# random plies that neither finish the game nor leave the side to move stuck
+def build_corpus(seed=CORPUS_SEED, size=CORPUS_SIZE, board=DEFAULT_BOARD):
+    to_pos = board.to_pos
+    rng = random.Random(seed)
+    corpus = []
+    while len(corpus) < size:
+        state = random_start(rng, rng.choice((0, 1)), board=board)
+        player_moves, ai_moves = set(), set()
+        (player_moves if state.side == PLAYER else ai_moves).add(to_pos(state.knight))
+        for _ in range(rng.randint(4, 12)):
+            moves = state.moves() & ~(1 << state.goal)
+            if not moves:
+                break
+            mover = state.side
+            state.play(rng.choice(list(squares(moves))))
+            # The piece that moved is recorded for the side that moved it
+            (player_moves if mover == PLAYER else ai_moves).add(to_pos(state.knight))
+        if state.moves() & ~(1 << state.goal):
+            corpus.append((state, player_moves, ai_moves))
+    return corpus
+
+
+# Stands in for an AI search that never finishes, so PlayScene.update()
+# keeps drawing the thinking indicator without starting a real search
+class _PendingTask():
+    def done(self):
+        return False
+
+
+# Time `number` calls of `func`. `setup`, if given, runs before each call
+# and is left out of the time.
+def _time_calls(func, number, setup=None):
+    if setup is None:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+    elapsed = 0.0
+    for _ in range(number):
+        setup()
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+# Call `func` in batches until `min_time` seconds have passed and return the
+# fastest per-call time over `repeat` rounds
+def measure(func, repeat=5, min_time=0.2, setup=None):
+    number = 1
+    while True:
+        elapsed = _time_calls(func, number, setup)
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, _time_calls(func, number, setup) / number)
+    return best, number
+
+
+# Mean time between frames of the game loop while the AI thinks about its
+# first move. The search runs outside the game process, so at the frame
+# cap this stays at one frame budget however long the search takes.
+def measure_ai_thinking_frames(game, frames, warmup=30):
+    think_time = game.AI_THINK_TIME
+    game.AI_THINK_TIME = 60.0
+    manager = game.SceneManager(game.screen, game.FPS)
+    scene = game.PlayScene("AI")
+    update = scene.update
+    times = []
+
+    def timed_update():
+        times.append(time.perf_counter())
+        return update()
+    scene.update = timed_update
+    try:
+        manager.run(scene, max_frames=warmup + frames)
+    finally:
+        game.AI_THINK_TIME = think_time
+        game.ai_worker.shutdown()
+    return (times[-1] - times[warmup]) / (len(times) - 1 - warmup)
+
+
+# Wall time of a fresh interpreter running `args`, best of `repeat` runs
+def measure_startup(args, repeat=5):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYTHONPATH=SRC_DIR)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=GAME_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(quick=False):
+    # main.py loads its assets relative to the game folder
+    os.chdir(GAME_DIR)
+    import pygame
+    import main as game
+    game.init_display()
+
+    corpus = build_corpus()
+    repeat = 3 if quick else 5
+    min_time = 0.05 if quick else 0.2
+    results = {}
+
+    def record(name, func, per_call_items=1, setup=None):
+        seconds, calls = measure(func, repeat=repeat, min_time=min_time, setup=setup)
+        results[name] = {"us_per_call": 1e6 * seconds / per_call_items, "calls": calls}
+
+    to_pos = DEFAULT_BOARD.to_pos
+    positions = [(to_pos(state.knight), to_pos(state.goal), state.visited) for state, _, _ in corpus]
+    targets = [(pos, move, visited) for pos, _, visited in positions for move in rules.generate_knight_moves(pos)]
+
+    def knight_moves():
+        for pos, _, _ in positions:
+            rules.generate_knight_moves(pos)
+    record("generate_knight_moves", knight_moves, len(positions))
+
+    def valid_moves():
+        for start, end, visited in targets:
+            rules.is_valid_knight_move(start, end, visited)
+    record("is_valid_knight_move", valid_moves, len(targets))
+
+    def a_star():
+        for pos, goal, visited in positions:
+            rules.a_star_search(pos, goal, visited)
+    record("a_star_search", a_star, len(positions))
+
+    # Searches start from an empty transposition table, cleared outside the
+    # timed calls
+    clear_table = rules.get_default_searcher().table.clear
+
+    for depth in MINIMAX_DEPTHS:
+        def minimax():
+            for pos, goal, visited in positions:
+                rules.minimax(pos, goal, depth, float('-inf'), float('inf'), True, visited)
+        record(f"minimax_depth_{depth}", minimax, len(positions), setup=clear_table)
+
+    def board():
+        for _, player_moves, ai_moves in corpus:
+            game.draw_board(player_moves, ai_moves)
+    record("draw_board", board, len(corpus))
+
+    # Frames of a game in progress: PlayScene.update() with its display
+    # update while the AI thinks, with the thinking indicator redrawn on
+    # every frame, and one move through move_knight() on a freshly started
+    # game
+    random.seed(CORPUS_SEED)
+    manager = game.SceneManager(game.screen, game.FPS)
+    scene = game.PlayScene("AI")
+    scene.enter(manager)
+    scene.ai_task = _PendingTask()
+
+    def stale_indicator():
+        scene.thinking_dots = ""
+
+    def play_frame():
+        pygame.display.update(scene.update())
+    record("play_frame", play_frame, setup=stale_indicator)
+
+    move_scene = []
+
+    def start_game():
+        scene = game.PlayScene("Player")
+        scene.enter(manager)
+        moves = scene.state.moves()
+        square = next(squares(moves & ~(1 << scene.state.goal) or moves))
+        move_scene[:] = [scene, scene.board.to_pos(square)]
+
+    def play_move():
+        scene, pos = move_scene
+        pygame.display.update(scene.move_knight(pos, scene.player_moves, game.PLAYER_TILE, game.screen.get_width() - 150))
+    record("play_move", play_move, setup=start_game)
+
+    frames = AI_THINKING_FRAMES // 2 if quick else AI_THINKING_FRAMES
+    results["ai_thinking_frame"] = {
+        "us_per_call": 1e6 * measure_ai_thinking_frames(game, frames), "calls": frames, "budget_us": 1e6 / game.FPS}
+
+    # Larger boards: pathfinding, distance fields and a fixed-size search
+    for board_size in LARGE_BOARD_SIZES:
+        board = get_board(board_size)
+        large = [state for state, _, _ in build_corpus(size=8, board=board)]
+
+        def large_a_star():
+            for state in large:
+                rules.a_star_search(board.to_pos(state.knight), board.to_pos(state.goal), state.visited, board_size)
+        record(f"a_star_board_{board_size}", large_a_star, len(large))
+
+        def large_field():
+            for state in large:
+                DistanceField(state.goal, state.visited, board)
+        record(f"distance_field_board_{board_size}", large_field, len(large))
+
+        def large_search():
+            for state in large:
+                rules.get_default_searcher().search(state, max_depth=3)
+        record(f"search_depth_3_board_{board_size}", large_search, len(large), setup=clear_table)
+
+        # A time-limited search has to stop close to its limit however much
+        # a node costs on this board; the slowest one is reported
+        slowest = 0.0
+        for state in large:
+            clear_table()
+            start = time.perf_counter()
+            rules.get_default_searcher().search(state, time_limit=SEARCH_TIME_LIMIT)
+            slowest = max(slowest, time.perf_counter() - start)
+        results[f"search_time_limit_board_{board_size}"] = {
+            "us_per_call": 1e6 * slowest, "calls": len(large), "budget_us": 1e6 * SEARCH_TIME_LIMIT}
+
+    # Leaf evaluation one position at a time and as one NumPy batch
+    batch_states = [state for state, _, _ in build_corpus(size=BATCH_SIZE)]
+
+    def evaluate_each():
+        for state in batch_states:
+            evaluate(state)
+    record("evaluate_loop", evaluate_each, len(batch_states))
+
+    if batch is not None:
+        record("evaluate_batch", lambda: batch.evaluate_states(batch_states), len(batch_states))
+
+    startup_runs = 3 if quick else 5
+    results["startup_import_engine"] = {
+        "us_per_call": 1e6 * measure_startup(["-c", "import engine"], startup_runs), "calls": startup_runs}
+    results["startup_first_frame"] = {
+        "us_per_call": 1e6 * measure_startup([os.path.join(SRC_DIR, "main.py"), "--frames", "1"], startup_runs),
+        "calls": startup_runs}
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pygame": pygame.version.ver,
+        "corpus": {"seed": CORPUS_SEED, "size": len(corpus)},
+        "benchmarks": results,
+    }
+
+
+# Benchmarks over their own budget * (1 + threshold)
+def over_budget(report, threshold):
+    return [(name, result["budget_us"], result["us_per_call"]) for name, result in report["benchmarks"].items()
+            if "budget_us" in result and result["us_per_call"] > result["budget_us"] * (1 + threshold)]
+
+# Benchmarks that got slower than baseline * (1 + threshold)
+def compare(report, baseline, threshold):
+    regressions = []
+    for name, result in report["benchmarks"].items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference is None:
+            continue
+        ratio = result["us_per_call"] / reference["us_per_call"]
+        if ratio > 1 + threshold:
+            regressions.append((name, reference["us_per_call"], result["us_per_call"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine and rendering hot paths.")
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON to PATH")
+    parser.add_argument("--save", metavar="PATH", help="alias for --output, for storing a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (default 0.25)")
+    parser.add_argument("--quick", action="store_true", help="shorter timing runs")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    cwd = os.getcwd()
+    report = run_benchmarks(quick=args.quick)
+    for name, result in report["benchmarks"].items():
+        print(f"{name:<24} {result['us_per_call']:12.2f} us/call")
+
+    output = args.output or args.save
+    if output:
+        output = os.path.join(cwd, output)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    for name, budget, took in over_budget(report, args.threshold):
+        print(f"OVER BUDGET {name}: {took:.2f} us/call, budget {budget:.2f} us/call")
+        status = 1
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} us/call ({ratio:.2f}x)")
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
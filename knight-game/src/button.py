@@ -15,6 +15,9 @@ def draw_rounded_rect(surface, color, rect, corner_radius):
     pygame.draw.circle(surface, color, (rect.left + corner_radius, rect.bottom - corner_radius), corner_radius)
     pygame.draw.circle(surface, color, (rect.right - corner_radius, rect.bottom - corner_radius), corner_radius)
 
+# Retained button widget. Both text surfaces are rendered once up front and
+# swapped only when the hover state changes, so a button is built once per
+# screen and only needs redrawing while `dirty` is set.
 class Button():
     def __init__(self, image, pos, text_input, font, base_color, hovering_color, corner_radius=20):
         self.image = image
@@ -24,24 +27,62 @@ class Button():
         self.base_color, self.hovering_color = base_color, hovering_color
         self.text_input = text_input
         self.corner_radius = corner_radius
-        self.text = self.font.render(self.text_input, True, self.base_color)
-        if self.image is None:
-            self.image = self.text
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+        self.base_text = self.font.render(self.text_input, True, self.base_color)
+        self.hover_text = self.font.render(self.text_input, True, self.hovering_color)
+        self.text = self.base_text
+        self.hovered = False
+        self.dirty = True
         self.text_rect = self.text.get_rect(center=(self.x_pos, self.y_pos))
-    
+        if self.image is not None:
+            self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+        else:
+            self.rect = self.text_rect.copy()
+        # Everything the button paints, used as its dirty rectangle
+        self.area = self.rect.union(self.text_rect)
+
     def update(self, screen):
         if self.image is not None:
             screen.blit(self.image, self.rect)
         screen.blit(self.text, self.text_rect)
-    
+        self.dirty = False
+        return self.area
+
     def checkInput(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-            return True
-        return False
-    
+        return self.rect.collidepoint(position)
+
+    # Swap to the hover or base text. Returns True if the look changed.
     def changeColor(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-            self.text = self.font.render(self.text_input, True, self.hovering_color)
-        else:
-            self.text = self.font.render(self.text_input, True, self.base_color)
+        hovered = bool(self.rect.collidepoint(position))
+        if hovered == self.hovered:
+            return False
+        self.hovered = hovered
+        self.text = self.hover_text if hovered else self.base_text
+        self.dirty = True
+        return True
+
+
+# The buttons of one screen. Tracks hover changes and redraws only the
+# buttons whose look changed, returning the rectangles that need to be
+# pushed to the display.
+class ButtonGroup():
+    def __init__(self, *buttons):
+        self.buttons = list(buttons)
+
+    def changeColor(self, position):
+        changed = False
+        for button in self.buttons:
+            changed |= button.changeColor(position)
+        return changed
+
+    # Draw the dirty buttons, or all of them with `force`. If a background
+    # surface is given, each button's area is restored from it first so the
+    # antialiased text edges don't build up.
+    def draw(self, screen, background=None, force=False):
+        dirty_rects = []
+        for button in self.buttons:
+            if not (force or button.dirty):
+                continue
+            if background is not None:
+                screen.blit(background, button.area, button.area)
+            dirty_rects.append(button.update(screen))
+        return dirty_rects
@@ -0,0 +1,14 @@
+# Headless game engine: board representation, rules, pathfinding and
+# search. Nothing in this package imports pygame. engine.batch needs NumPy
+# and is only loaded when imported directly.
+
+from .board import (GameState, Board, get_board, PLAYER, AI, SIDE_NAMES, BOARD_SIZE, DEFAULT_BOARD_SIZE, MIN_BOARD_SIZE,
+                    NUM_SQUARES, KNIGHT_ATTACKS)
+from .openings import DIFFICULTIES, opening_pairs, random_start
+from .pathfind import DistanceField, a_star, goal_distance
+from .search import Searcher, ParallelSearcher, SearchResult, TranspositionTable
+from .mcts import MCTSSearcher, ParallelMCTS
+from .instrument import Instruments, instruments
+from .record import GameRecord, RecordWriter, RecordCorpus, stream_records
+from .rules import (is_valid_knight_move, a_star_search, minimax, mcts_search, heuristic, generate_knight_moves,
+                    generate_position_ranges, to_chess_notation)
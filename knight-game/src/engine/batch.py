@@ -0,0 +1,121 @@
+# Batched position evaluation with NumPy
+#
+# evaluate_batch() scores thousands of positions in one call and gives the
+# same numbers as search.evaluate() does one position at a time. Each
+# position is a boolean board, and the knight-distance wavefront of every
+# position in the batch is expanded together, one knight move per step,
+# with eight shifted ORs over the whole batch. Positions drop out of the
+# batch as soon as their goal is reached or their wavefront dies out.
+#
+# NumPy is only needed for this module; the rest of the engine does not
+# import it.
+
+import numpy as np
+
+from .board import DEFAULT_BOARD, KNIGHT_OFFSETS
+
+# Unreachable goals get this distance in goal_distances()
+NO_PATH = -1
+
+# Boards are stored with a border of PAD blocked squares on every side and
+# flattened to one row per position. A knight move is then a shift of the
+# whole batch buffer by dy * width + dx: the border is wide enough that no
+# move crosses from one position into the next, and the border squares are
+# never open, so whatever lands there is masked off.
+PAD = 2
+
+# Visited masks (Python ints) as an array of shape (len(masks), size, size)
+def unpack_masks(masks, board=DEFAULT_BOARD):
+    length = (board.num_squares + 7) // 8
+    data = b"".join(mask.to_bytes(length, "little") for mask in masks)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, length), axis=1, bitorder="little")
+    return bits[:, :board.num_squares].reshape(-1, board.size, board.size).astype(bool)
+
+def _as_boards(visited, board):
+    if isinstance(visited, np.ndarray) and visited.dtype == bool:
+        return visited.reshape(-1, board.size, board.size)
+    return unpack_masks([int(mask) for mask in visited], board)
+
+# Flat index of `square` in a padded board
+def _padded_index(squares, size):
+    y, x = np.divmod(squares, size)
+    return (y + PAD) * (size + 2 * PAD) + x + PAD
+
+# Every square a knight on any True square of the padded, flattened
+# `boards` attacks
+def spread(boards, size):
+    width = size + 2 * PAD
+    flat = boards.reshape(-1)
+    result = np.zeros_like(flat)
+    for dx, dy in KNIGHT_OFFSETS:
+        shift = dy * width + dx
+        if shift > 0:
+            result[shift:] |= flat[:-shift]
+        else:
+            result[:shift] |= flat[-shift:]
+    return result.reshape(boards.shape)
+
+# Knight moves from each knight to its goal through unvisited squares, as
+# goal_distance() counts them, and the number of legal moves of each
+# knight. Distances are NO_PATH where the goal cannot be reached.
+def goal_distances(knights, goals, visited, board=DEFAULT_BOARD):
+    size = board.size
+    width = size + 2 * PAD
+    count = len(knights)
+    knights = _padded_index(np.asarray(knights, dtype=np.int64), size)
+    goals = _padded_index(np.asarray(goals, dtype=np.int64), size)
+
+    open_squares = np.zeros((count, width, width), dtype=bool)
+    open_squares[:, PAD:PAD + size, PAD:PAD + size] = ~_as_boards(visited, board)
+    open_squares = open_squares.reshape(count, width * width)
+
+    distance = np.full(count, NO_PATH, dtype=np.int64)
+    mobility = np.zeros(count, dtype=np.int64)
+    rows = np.arange(count)
+    reached = np.zeros((count, width * width), dtype=bool)
+    reached[rows, knights] = True
+    frontier = reached.copy()
+
+    # Indices into the full batch of the positions still expanding, and
+    # their goals and open squares
+    active = rows
+    active_goals = goals
+    active_open = open_squares
+    step = 0
+    while len(active):
+        step += 1
+        frontier = spread(frontier, size)
+        if step == 1:
+            mobility[active] = (frontier & active_open).sum(axis=1)
+        hit = frontier[np.arange(len(active)), active_goals]
+        distance[active[hit]] = step
+
+        frontier &= active_open
+        frontier &= ~reached
+        reached |= frontier
+        keep = ~hit & frontier.any(axis=1)
+        if not keep.all():
+            active = active[keep]
+            active_goals = active_goals[keep]
+            active_open = active_open[keep]
+            frontier = frontier[keep]
+            reached = reached[keep]
+    return distance, mobility
+
+# Scores of many positions from the point of view of the side to move,
+# equal to search.evaluate() on each of them. `knights` and `goals` are
+# square indices and `visited` is a sequence of visited masks or a boolean
+# array of shape (n, size, size).
+def evaluate_batch(knights, goals, visited, board=DEFAULT_BOARD):
+    distance, mobility = goal_distances(knights, goals, visited, board)
+    score = 1000 - 10 * distance
+    score = np.where(distance % 2 == 1, score, -score) + mobility
+    return np.where(distance == NO_PATH, mobility, score)
+
+# evaluate_batch() for a list of GameStates on the same board
+def evaluate_states(states):
+    if not states:
+        return np.zeros(0, dtype=np.int64)
+    board = states[0].board
+    return evaluate_batch([state.knight for state in states], [state.goal for state in states],
+                          [state.visited for state in states], board)
@@ -0,0 +1,225 @@
+# Bitboard representation of the game
+#
+# Squares are numbered y * size + x, so on the default 8x8 board (0, 0) is
+# bit 0 and (7, 7) is bit 63. A set of squares is a plain Python int with
+# one bit per square, which grows to any board size.
+#
+# Everything that depends on the board size lives on a Board, built once
+# per size by get_board() and shared by every game of that size. The
+# module-level names are the tables of the default 8x8 board.
+
+PLAYER = 0
+AI = 1
+SIDE_NAMES = ("Player", "AI")
+
+DEFAULT_BOARD_SIZE = 8
+MIN_BOARD_SIZE = 5
+
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (-1, 2), (-2, 1), (1, -2), (2, -1), (-1, -2), (-2, -1)]
+
+# Boards with more squares than this build their attack masks on first use
+# instead of all up front
+EAGER_ATTACKS_SQUARES = 4096
+
+# Number of set bits in a bitboard
+def popcount(bb):
+    return bb.bit_count()
+
+# Yield the square index of every set bit, lowest first
+def squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+# Knight moves between two squares (dx, dy) apart on an unbounded board
+def _open_knight_distance(dx, dy):
+    dx, dy = abs(dx), abs(dy)
+    if dx < dy:
+        dx, dy = dy, dx
+    if dx == 1 and dy == 0:
+        return 3
+    if dx == 2 and dy == 2:
+        return 4
+    delta = dx - dy
+    if dy > delta:
+        return delta - 2 * ((delta - dy) // 3)
+    return delta - 2 * ((delta - dy) // 4)
+
+
+# Attack masks of a large board, computed the first time a square is looked up
+class _LazyAttacks(dict):
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+
+    def __missing__(self, square):
+        mask = self.board.attacks_of(square)
+        self[square] = mask
+        return mask
+
+
+# Geometry and move tables of one board size
+class Board():
+    def __init__(self, size):
+        if size < MIN_BOARD_SIZE:
+            raise ValueError(f"board size must be at least {MIN_BOARD_SIZE}, got {size}")
+        self.size = size
+        self.num_squares = size * size
+        self.full_mask = (1 << self.num_squares) - 1
+
+        # Column masks for moving a whole bitboard at once: a shift by
+        # dy * size + dx, keeping only the columns a knight can land on
+        self.shifts = []
+        for dx, dy in KNIGHT_OFFSETS:
+            columns = 0
+            for x in range(max(dx, 0), size + min(dx, 0)):
+                columns |= 1 << x
+            row_mask = 0
+            for y in range(size):
+                row_mask |= columns << (y * size)
+            self.shifts.append((dy * size + dx, row_mask))
+
+        if self.num_squares <= EAGER_ATTACKS_SQUARES:
+            self.knight_attacks = tuple(self.attacks_of(square) for square in range(self.num_squares))
+        else:
+            self.knight_attacks = _LazyAttacks(self)
+
+        self.white_squares = tuple(square for square in range(self.num_squares) if self.is_white_square(square))
+        self.black_squares = tuple(square for square in range(self.num_squares) if not self.is_white_square(square))
+
+    def on_board(self, pos):
+        return 0 <= pos[0] < self.size and 0 <= pos[1] < self.size
+
+    def to_square(self, pos):
+        return pos[1] * self.size + pos[0]
+
+    def to_pos(self, square):
+        return (square % self.size, square // self.size)
+
+    # Squares with (x + y) even are the light tiles of the board
+    def is_white_square(self, square):
+        x, y = self.to_pos(square)
+        return (x + y) % 2 == 0
+
+    def attacks_of(self, square):
+        x, y = self.to_pos(square)
+        mask = 0
+        for dx, dy in KNIGHT_OFFSETS:
+            if 0 <= x + dx < self.size and 0 <= y + dy < self.size:
+                mask |= 1 << ((y + dy) * self.size + x + dx)
+        return mask
+
+    # Every square a knight on any square of `bb` attacks, in eight shifts
+    def spread(self, bb):
+        result = 0
+        for shift, mask in self.shifts:
+            if shift > 0:
+                result |= (bb << shift) & mask
+            else:
+                result |= (bb >> -shift) & mask
+        return result & self.full_mask
+
+    # Exact knight moves between two squares on the empty board. Away from
+    # the corners this is the unbounded-board distance; the only exception
+    # on boards of 5x5 and up is a corner and its diagonal neighbour.
+    def knight_distance(self, a, b):
+        ax, ay = self.to_pos(a)
+        bx, by = self.to_pos(b)
+        if abs(ax - bx) == 1 and abs(ay - by) == 1:
+            edge = self.size - 1
+            if (ax in (0, edge) and ay in (0, edge)) or (bx in (0, edge) and by in (0, edge)):
+                return 4
+        return _open_knight_distance(ax - bx, ay - by)
+
+    def __repr__(self):
+        return f"Board({self.size})"
+
+    def __reduce__(self):
+        return get_board, (self.size,)
+
+
+_boards = {}
+
+# Shared Board for `size`, built on first use
+def get_board(size=DEFAULT_BOARD_SIZE):
+    board = _boards.get(size)
+    if board is None:
+        board = _boards[size] = Board(size)
+    return board
+
+DEFAULT_BOARD = get_board(DEFAULT_BOARD_SIZE)
+
+BOARD_SIZE = DEFAULT_BOARD.size
+NUM_SQUARES = DEFAULT_BOARD.num_squares
+KNIGHT_ATTACKS = DEFAULT_BOARD.knight_attacks
+
+# Convert between (x, y) board coordinates and square indices
+def on_board(pos, board=DEFAULT_BOARD):
+    return board.on_board(pos)
+
+def to_square(pos, board=DEFAULT_BOARD):
+    return board.to_square(pos)
+
+def to_pos(square, board=DEFAULT_BOARD):
+    return board.to_pos(square)
+
+def mask_of(positions, board=DEFAULT_BOARD):
+    mask = 0
+    for pos in positions:
+        mask |= 1 << board.to_square(pos)
+    return mask
+
+def is_white_square(square, board=DEFAULT_BOARD):
+    return board.is_white_square(square)
+
+def is_legal(start, end, visited, board=DEFAULT_BOARD):
+    return (board.knight_attacks[start] >> end) & 1 == 1 and not (visited >> end) & 1
+
+
+# Full position: where the knight stands, where the goal is, which squares
+# are blocked and whose turn it is, on a board of any size
+class GameState():
+    __slots__ = ("knight", "goal", "visited", "side", "board")
+
+    def __init__(self, knight, goal, visited=None, side=PLAYER, board=DEFAULT_BOARD):
+        self.knight = knight
+        self.goal = goal
+        self.visited = (1 << knight) if visited is None else visited
+        self.side = side
+        self.board = board
+
+    @classmethod
+    def from_positions(cls, knight_pos, goal_pos, visited=(), side=PLAYER, board=DEFAULT_BOARD):
+        knight = board.to_square(knight_pos)
+        return cls(knight, board.to_square(goal_pos), mask_of(visited, board) | (1 << knight), side, board)
+
+    def copy(self):
+        return GameState(self.knight, self.goal, self.visited, self.side, self.board)
+
+    def moves(self):
+        return self.board.knight_attacks[self.knight] & ~self.visited
+
+    def is_won(self):
+        return self.knight == self.goal
+
+    # Knight moves to `square`, which becomes blocked, and the turn passes
+    def play(self, square):
+        self.knight = square
+        self.visited |= 1 << square
+        self.side ^= 1
+
+    def __eq__(self, other):
+        return (isinstance(other, GameState) and self.knight == other.knight and self.goal == other.goal
+                and self.visited == other.visited and self.side == other.side and self.board is other.board)
+
+    def __hash__(self):
+        return hash((self.knight, self.goal, self.visited, self.side, self.board.size))
+
+    def __repr__(self):
+        if self.board is DEFAULT_BOARD:
+            visited, size = f"{self.visited:#x}", ""
+        else:
+            visited, size = f"<{popcount(self.visited)} squares>", f", size={self.board.size}"
+        return (f"GameState(knight={self.board.to_pos(self.knight)}, goal={self.board.to_pos(self.goal)}, "
+                f"visited={visited}, side={SIDE_NAMES[self.side]}{size})")
@@ -0,0 +1,132 @@
+# Counters, timing histograms and a JSON-lines event log
+#
+# One shared Instruments object, `instruments`, is off by default. Code that
+# reports to it checks `instruments.enabled` first, once per search or per
+# frame rather than per node, so a disabled instance costs one attribute
+# read in each of those places. The engine reports search nodes,
+# transposition table hits, cutoffs, A* expansions and cache hits; the GUI
+# adds frame times.
+#
+# With a sink file every event is written as one JSON object per line:
+#
+#   {"t": 1760800000.123, "event": "search", "engine": "alphabeta", "ms": 412.5, ...}
+
+import json
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bucket edges of every histogram, in milliseconds. The edges around
+# 16.7 ms tell a frame at 60 fps from a slightly late one.
+HISTOGRAM_EDGES = (0.5, 1, 2, 4, 8, 12, 16, 17, 20, 25, 33, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+
+# Bucketed distribution of durations in milliseconds. Percentiles are the
+# upper edge of the bucket they fall in, capped at the largest value seen.
+class Histogram():
+    def __init__(self):
+        self.buckets = [0] * len(HISTOGRAM_EDGES)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.buckets[bisect_left(HISTOGRAM_EDGES, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for edge, count in zip(HISTOGRAM_EDGES, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(edge, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max,
+            "buckets": {str(edge): count for edge, count in zip(HISTOGRAM_EDGES, self.buckets) if count},
+        }
+
+
+class Instruments():
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+        # Fields of the most recent event of each kind, for the overlay
+        self.last = {}
+        self.sink = None
+        # Reports may come from more than one thread
+        self.lock = threading.Lock()
+
+    # Start collecting, and append events to the file at `path` if given
+    def enable(self, path=None):
+        if path is not None and self.sink is None:
+            self.sink = open(path, "a", buffering=1)
+        self.enabled = True
+
+    # Stop collecting. With a sink, a final summary line is written first.
+    def disable(self):
+        if self.sink is not None:
+            self.event("summary", **self.snapshot())
+            self.sink.close()
+            self.sink = None
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.last.clear()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, ms):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    def event(self, kind, **fields):
+        with self.lock:
+            self.last[kind] = fields
+            if self.sink is not None:
+                self.sink.write(json.dumps({"t": round(time.time(), 3), "event": kind, **fields}) + "\n")
+
+    # Counters and histogram summaries as one JSON-friendly dict
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+    # Report one finished AI search: its nodes and any extra counters go
+    # to "<engine>.<name>" counters, its time to the "search.<engine>"
+    # histogram, and the whole result to a "search" event
+    def record_search(self, engine, result, **counters):
+        ms = result.elapsed * 1000
+        self.count(f"{engine}.searches")
+        self.count(f"{engine}.nodes", result.nodes)
+        for name, amount in counters.items():
+            self.count(f"{engine}.{name}", amount)
+        self.observe(f"search.{engine}", ms)
+        self.event("search", engine=engine, move=result.move, score=result.score, depth=result.depth,
+                   nodes=result.nodes, ms=round(ms, 3), **counters)
+
+
+instruments = Instruments()
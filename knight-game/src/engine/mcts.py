@@ -0,0 +1,286 @@
+# Monte Carlo tree search
+#
+# UCT over the same rules as the alpha-beta searcher: each iteration walks
+# down the tree picking the child with the best upper confidence bound,
+# adds one new node, plays the game out with a fast rollout policy and
+# credits the result back up the path. The search is anytime: it stops
+# when the time, iteration or stop-event budget runs out and answers with
+# the most visited move, so per-move latency is bounded by the budget
+# rather than by a depth.
+#
+# The tree is kept between moves. When the next search starts from a
+# position two plies below the old root (our move, then the reply), that
+# subtree becomes the new root with all its statistics.
+
+import math
+import os
+import random
+import time
+
+from .board import GameState, get_board, squares
+from .instrument import instruments
+from .pathfind import distance_row
+from .search import WIN_SCORE, SearchResult
+
+DEFAULT_EXPLORATION = 1.4
+DEFAULT_ITERATIONS = 20000  # budget when neither a time nor an iteration limit is given
+ROLLOUTS = ("random", "greedy")
+
+
+# One position in the tree. `wins` counts rollouts won by the side that
+# made `move`, i.e. the side to move at the parent.
+class Node():
+    __slots__ = ("move", "parent", "knight", "visited", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, knight, visited, moves):
+        self.move = move
+        self.parent = parent
+        self.knight = knight
+        self.visited = visited
+        self.children = []
+        self.untried = list(squares(moves))
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MCTSSearcher():
+    def __init__(self, exploration=DEFAULT_EXPLORATION, rollout="random", seed=None, reuse_tree=True):
+        if rollout not in ROLLOUTS:
+            raise ValueError(f"unknown rollout policy {rollout!r}, expected one of {ROLLOUTS}")
+        self.exploration = exploration
+        self.rollout_policy = rollout
+        self.rng = random.Random(seed)
+        self.reuse_tree = reuse_tree
+        self.root = None
+        self.goal = None
+        self.board = None
+        self.iterations = 0
+
+    # Subtree of the previous search for `state`, if it is the root or one
+    # or two plies below it
+    def _reuse(self, state):
+        root = self.root
+        if not self.reuse_tree or root is None or self.goal != state.goal or self.board is not state.board:
+            return None
+        frontier = [root]
+        for _ in range(3):
+            for node in frontier:
+                if node.knight == state.knight and node.visited == state.visited:
+                    node.parent = None
+                    return node
+            frontier = [child for node in frontier for child in node.children]
+        return None
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        best = None
+        best_value = -1.0
+        for child in node.children:
+            value = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    # Play on from (knight, visited) with the side to move numbered 0 and
+    # return 0 or 1 for the side that wins
+    def _rollout(self, knight, visited):
+        attacks = self.board.knight_attacks
+        goal = self.goal
+        greedy = self.rollout_policy == "greedy"
+        distance = distance_row(goal, self.board) if greedy else None
+        choice = self.rng.choice
+        side = 0
+        while True:
+            moves = attacks[knight] & ~visited
+            if (moves >> goal) & 1:
+                return side
+            if not moves:
+                return side ^ 1
+            options = list(squares(moves))
+            if greedy:
+                nearest = min(distance[square] for square in options)
+                options = [square for square in options if distance[square] == nearest]
+            knight = choice(options)
+            visited |= 1 << knight
+            side ^= 1
+
+    # One iteration: select, expand, roll out, back up
+    def _iterate(self, root):
+        attacks = self.board.knight_attacks
+        goal = self.goal
+        node = root
+        path = [node]
+        winner = None
+        # Depth parity of the last node on the path: 0 is the root's side
+        side = 0
+        while True:
+            if node.knight == goal and node is not root:
+                # The side that moved onto the goal won
+                winner = side ^ 1
+                break
+            if node.untried:
+                square = node.untried.pop(self.rng.randrange(len(node.untried)))
+                visited = node.visited | (1 << square)
+                moves = attacks[square] & ~visited if square != goal else 0
+                child = Node(square, node, square, visited, moves)
+                node.children.append(child)
+                node = child
+                path.append(node)
+                side ^= 1
+                if square == goal:
+                    winner = side ^ 1
+                elif not moves:
+                    winner = side ^ 1
+                else:
+                    winner = side ^ self._rollout(square, visited)
+                break
+            if not node.children:
+                # No legal move: the side to move here loses
+                winner = side ^ 1
+                break
+            node = self._select(node)
+            path.append(node)
+            side ^= 1
+
+        # A node's wins belong to the side that moved into it, which is the
+        # opposite of the side to move at that node
+        depth_side = 0
+        for node in path:
+            node.visits += 1
+            if winner != depth_side:
+                node.wins += 1
+            depth_side ^= 1
+        return len(path) - 1
+
+    # Run MCTS from `state` until the budget runs out. `node_limit` caps
+    # the number of iterations; `max_depth` and `field` are accepted for
+    # compatibility with Searcher and ignored.
+    def search(self, state, max_depth=None, time_limit=None, node_limit=None, field=None, stop=None):
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit is not None else None
+        if deadline is None and node_limit is None:
+            node_limit = DEFAULT_ITERATIONS
+
+        moves = state.moves()
+        if (moves >> state.goal) & 1:
+            return SearchResult(state.goal, WIN_SCORE - 1, 1, 0, time.perf_counter() - start)
+        if not moves:
+            return SearchResult(None, -WIN_SCORE, 0, 0, time.perf_counter() - start)
+
+        root = self._reuse(state)
+        self.goal = state.goal
+        self.board = state.board
+        if root is None:
+            root = Node(None, None, state.knight, state.visited, moves)
+        self.root = root
+        reused_visits = root.visits
+
+        iterations = 0
+        max_depth_seen = 0
+        while True:
+            depth = self._iterate(root)
+            iterations += 1
+            if depth > max_depth_seen:
+                max_depth_seen = depth
+            if node_limit is not None and iterations >= node_limit:
+                break
+            # A rollout costs far more than a clock read, so the budget is
+            # checked after every iteration
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+        self.iterations = iterations
+
+        best = max(root.children, key=lambda child: (child.visits, child.wins))
+        result = SearchResult(best.move, _win_rate_score(best.wins, best.visits), max_depth_seen, iterations,
+                              time.perf_counter() - start)
+        if instruments.enabled:
+            instruments.record_search("mcts", result, reused_visits=reused_visits, tree_visits=root.visits)
+        return result
+
+    # Visits and wins of each root move from the last search
+    def root_stats(self):
+        if self.root is None:
+            return {}
+        return {child.move: (child.visits, child.wins) for child in self.root.children}
+
+
+# Win rate as a score on the scale of the alpha-beta evaluation
+def _win_rate_score(wins, visits):
+    if not visits:
+        return 0
+    return int(round((2 * wins / visits - 1) * 1000))
+
+
+# Process pool workers keep one tree each, so a worker that gets the next
+# position of the same game can reuse its tree
+_worker_mcts = None
+
+def _init_worker(exploration, rollout, seed):
+    global _worker_mcts
+    _worker_mcts = MCTSSearcher(exploration, rollout, seed=f"{seed}:{os.getpid()}" if seed is not None else None)
+
+def _search_worker(size, knight, goal, visited, side, time_limit, node_limit):
+    state = GameState(knight, goal, visited, side, get_board(size))
+    result = _worker_mcts.search(state, time_limit=time_limit, node_limit=node_limit)
+    return _worker_mcts.root_stats(), result.depth, result.nodes
+
+
+# Root-parallel MCTS: every worker grows its own tree from the root with
+# its own random stream for the whole budget, then the root visit counts
+# are summed and the most visited move is played.
+class ParallelMCTS():
+    def __init__(self, workers=None, exploration=DEFAULT_EXPLORATION, rollout="random", seed=None):
+        # Imported here for the same reason as in ParallelSearcher
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing.util import Finalize
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(exploration, rollout, seed))
+        # A process that is itself a pool worker, like the game's AI worker,
+        # waits for its children at exit without shutting their pool down.
+        # This runs ahead of the pool queues' own exit finalizers, which
+        # have priority 10.
+        Finalize(self, self.pool.shutdown, kwargs={"cancel_futures": True}, exitpriority=100)
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, state, max_depth=None, time_limit=None, node_limit=None, field=None, stop=None):
+        start = time.perf_counter()
+        moves = state.moves()
+        if (moves >> state.goal) & 1:
+            return SearchResult(state.goal, WIN_SCORE - 1, 1, 0, time.perf_counter() - start)
+        if not moves:
+            return SearchResult(None, -WIN_SCORE, 0, 0, time.perf_counter() - start)
+        if time_limit is None and node_limit is None:
+            node_limit = DEFAULT_ITERATIONS
+
+        args = (state.board.size, state.knight, state.goal, state.visited, state.side, time_limit, node_limit)
+        futures = [self.pool.submit(_search_worker, *args) for _ in range(self.workers)]
+        totals = {}
+        depth = 0
+        nodes = 0
+        for future in futures:
+            stats, worker_depth, worker_nodes = future.result()
+            depth = max(depth, worker_depth)
+            nodes += worker_nodes
+            for move, (visits, wins) in stats.items():
+                total = totals.setdefault(move, [0, 0.0])
+                total[0] += visits
+                total[1] += wins
+
+        move = max(sorted(totals), key=lambda square: (totals[square][0], totals[square][1]))
+        visits, wins = totals[move]
+        result = SearchResult(move, _win_rate_score(wins, visits), depth, nodes, time.perf_counter() - start)
+        if instruments.enabled:
+            instruments.record_search("parallel_mcts", result, workers=self.workers)
+        return result
@@ -0,0 +1,130 @@
+# Precomputed opening positions
+#
+# play() starts the knight on a light tile when the AI moves first and on a
+# dark tile otherwise, and always puts the goal on a dark tile that is
+# neither the start nor one knight move away. Every (knight, goal) pair
+# allowed by that rule is built once per board size, grouped by who moves
+# first and by the knight distance between the two squares, so picking an
+# opening is a single rng.choice() on a tuple.
+#
+# A knight changes tile colour on every move, so the distance parity is
+# fixed by the start colour: on 8x8, light starts are 3 or 5 moves from the
+# goal and dark starts 2, 4 or 6. The difficulty buckets are therefore
+# relative to each side's shortest distance: "near" pairs are at that
+# distance, "far" pairs are further away.
+#
+# Boards too large to list every pair are sampled directly instead: the
+# start is drawn first, then a goal at the requested distance.
+
+from .board import DEFAULT_BOARD, GameState, PLAYER, AI, SIDE_NAMES, squares
+
+DIFFICULTIES = ("near", "far")
+
+# Shortest allowed distance for each side to move first
+NEAREST_DISTANCE = {PLAYER: 2, AI: 3}
+
+# Boards with more squares than this are sampled without a table
+OPENING_TABLE_SQUARES = 576
+
+def _starts(board, first_side):
+    return board.white_squares if first_side == AI else board.black_squares
+
+def _build_openings(board):
+    attacks = board.knight_attacks
+    table = {}
+    for side in (AI, PLAYER):
+        by_distance = {}
+        for knight in _starts(board, side):
+            for goal in board.black_squares:
+                if knight != goal and not (attacks[knight] >> goal) & 1:
+                    by_distance.setdefault(board.knight_distance(knight, goal), []).append((knight, goal))
+        table[side] = {distance: tuple(pairs) for distance, pairs in sorted(by_distance.items())}
+    return table
+
+def _build_buckets(openings):
+    buckets = {}
+    for side, by_distance in openings.items():
+        nearest = NEAREST_DISTANCE[side]
+        buckets[side] = {
+            None: tuple(pair for pairs in by_distance.values() for pair in pairs),
+            "near": by_distance.get(nearest, ()),
+            "far": tuple(pair for distance, pairs in by_distance.items() if distance != nearest for pair in pairs),
+        }
+    return buckets
+
+# Tables of every board size used so far: size -> (openings, buckets)
+_tables = {}
+
+def _table(board):
+    if board.num_squares > OPENING_TABLE_SQUARES:
+        raise ValueError(f"{board.size}x{board.size} is too large to list every opening")
+    tables = _tables.get(board.size)
+    if tables is None:
+        openings = _build_openings(board)
+        tables = _tables[board.size] = (openings, _build_buckets(openings))
+    return tables
+
+# OPENINGS[first_side][distance] is a tuple of (knight, goal) squares on 8x8
+OPENINGS = _table(DEFAULT_BOARD)[0]
+
+def _check_difficulty(difficulty):
+    if difficulty is not None and not isinstance(difficulty, int) and difficulty not in DIFFICULTIES:
+        raise ValueError(f"unknown difficulty {difficulty!r}, expected one of {DIFFICULTIES} or a distance")
+
+# All opening pairs for `first_side`, optionally limited to one difficulty
+# bucket ("near" or "far") or to one exact knight distance (an int)
+def opening_pairs(first_side, difficulty=None, board=DEFAULT_BOARD):
+    _check_difficulty(difficulty)
+    openings, buckets = _table(board)
+    if isinstance(difficulty, int):
+        return openings[first_side].get(difficulty, ())
+    return buckets[first_side][difficulty]
+
+# Squares exactly `distance` knight moves from `square` on the empty board
+def _ring(board, square, distance):
+    reached = frontier = 1 << square
+    for _ in range(distance):
+        frontier = board.spread(frontier) & ~reached
+        reached |= frontier
+    return frontier
+
+# Opening on a board too large for a table. The start is uniform over the
+# allowed squares; a "near" or exact-distance goal is then uniform over the
+# squares at that distance from it.
+def _sample_start(rng, first_side, difficulty, board):
+    starts = _starts(board, first_side)
+    nearest = NEAREST_DISTANCE[first_side]
+    exact = nearest if difficulty == "near" else difficulty if isinstance(difficulty, int) else None
+    if exact is not None:
+        if exact < nearest or (exact - nearest) % 2:
+            raise ValueError(f"no openings at distance {exact} when {SIDE_NAMES[first_side]} moves first")
+        # Each move changes the tile colour, so with the right parity the
+        # whole ring is on dark tiles
+        for _ in range(len(starts)):
+            knight = rng.choice(starts)
+            ring = _ring(board, knight, exact)
+            if ring:
+                return GameState(knight, rng.choice(list(squares(ring))), side=first_side, board=board)
+        raise ValueError(f"no openings at distance {exact} when {SIDE_NAMES[first_side]} moves first")
+
+    attacks = board.knight_attacks
+    while True:
+        knight = rng.choice(starts)
+        goal = rng.choice(board.black_squares)
+        if knight == goal or (attacks[knight] >> goal) & 1:
+            continue
+        if difficulty == "far" and board.knight_distance(knight, goal) == nearest:
+            continue
+        return GameState(knight, goal, side=first_side, board=board)
+
+# Random opening position as chosen by play(), drawn uniformly from the
+# allowed pairs with `rng` (random.Random or the random module)
+def random_start(rng, first_side, difficulty=None, board=DEFAULT_BOARD):
+    _check_difficulty(difficulty)
+    if board.num_squares > OPENING_TABLE_SQUARES:
+        return _sample_start(rng, first_side, difficulty, board)
+    pairs = opening_pairs(first_side, difficulty, board)
+    if not pairs:
+        raise ValueError(f"no openings at distance {difficulty} when {SIDE_NAMES[first_side]} moves first")
+    knight, goal = rng.choice(pairs)
+    return GameState(knight, goal, side=first_side, board=board)
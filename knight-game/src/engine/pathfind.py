@@ -0,0 +1,212 @@
+# Knight pathfinding on the bitboard state
+#
+# KNIGHT_DISTANCE[a][b] is the exact number of knight moves between two
+# squares on an empty 8x8 board. It never overestimates once squares are
+# blocked, so it is an admissible and consistent A* heuristic. Other board
+# sizes get the same distances from Board.knight_distance, one row per
+# goal, filled in as A* asks for them.
+
+from collections import deque
+from heapq import heappush, heappop
+
+from .board import DEFAULT_BOARD, squares
+from .instrument import instruments
+
+# Larger than any path on any board
+UNREACHABLE = 1 << 30
+
+# Breadth-first distances from `goal` to every square, skipping `blocked`.
+# Each level is one Board.spread of the previous one.
+def _bfs_distances(goal, blocked, board=DEFAULT_BOARD):
+    spread = board.spread
+    dist = [UNREACHABLE] * board.num_squares
+    dist[goal] = 0
+    open_mask = board.full_mask & ~blocked
+    reached = frontier = 1 << goal
+    step = 0
+    while frontier:
+        step += 1
+        frontier = spread(frontier) & open_mask & ~reached
+        reached |= frontier
+        for square in squares(frontier):
+            dist[square] = step
+    return dist
+
+KNIGHT_DISTANCE = tuple(tuple(_bfs_distances(square, 0)) for square in range(DEFAULT_BOARD.num_squares))
+
+
+# Empty-board distances to one goal, computed per square on first lookup
+class _DistanceRow(dict):
+    def __init__(self, board, goal):
+        super().__init__()
+        self.board = board
+        self.goal = goal
+
+    def __missing__(self, square):
+        distance = self.board.knight_distance(square, self.goal)
+        self[square] = distance
+        return distance
+
+# Recently used rows, oldest first
+_distance_rows = {}
+MAX_DISTANCE_ROWS = 256
+
+def distance_row(goal, board=DEFAULT_BOARD):
+    if board is DEFAULT_BOARD:
+        return KNIGHT_DISTANCE[goal]
+    key = (board.size, goal)
+    row = _distance_rows.pop(key, None)
+    if instruments.enabled:
+        instruments.count("distance_row.hits" if row is not None else "distance_row.misses")
+    if row is None:
+        row = _DistanceRow(board, goal)
+        if len(_distance_rows) >= MAX_DISTANCE_ROWS:
+            del _distance_rows[next(iter(_distance_rows))]
+    _distance_rows[key] = row
+    return row
+
+# A* from `start` to `goal` through unvisited squares. Returns the squares
+# of a shortest path, excluding `start`, or an empty list if there is none.
+def a_star(start, goal, visited, board=DEFAULT_BOARD):
+    if start == goal:
+        return [start]
+
+    attacks = board.knight_attacks
+    heuristic = distance_row(goal, board)
+    frontier = [(heuristic[start], 0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+
+    expanded = 0
+    while frontier:
+        _, cost, current = heappop(frontier)
+        if current == goal:
+            break
+        if cost > cost_so_far[current]:
+            continue
+        expanded += 1
+        new_cost = cost + 1
+        for square in squares(attacks[current] & ~visited):
+            if new_cost < cost_so_far.get(square, UNREACHABLE):
+                cost_so_far[square] = new_cost
+                came_from[square] = current
+                heappush(frontier, (new_cost + heuristic[square], new_cost, square))
+
+    if instruments.enabled:
+        instruments.count("a_star.searches")
+        instruments.count("a_star.expansions", expanded)
+    if goal not in came_from:
+        return []
+
+    path = []
+    current = goal
+    while current != start:
+        path.append(current)
+        current = came_from[current]
+    path.reverse()
+    return path
+
+# Number of knight moves from `start` to `goal` through unvisited squares,
+# or None if the goal cannot be reached. Expands a whole bitboard wavefront
+# per step with Board.spread instead of one square at a time.
+def goal_distance(start, goal, visited, board=DEFAULT_BOARD):
+    spread = board.spread
+    target = 1 << goal
+    reached = 1 << start
+    frontier = reached
+    distance = 0
+    while frontier:
+        distance += 1
+        frontier = spread(frontier)
+        if frontier & target:
+            return distance
+        frontier &= ~visited & ~reached
+        reached |= frontier
+    return None
+
+# Distance to the goal from every square, kept up to date as squares are
+# visited. Blocking one square only invalidates the squares whose every
+# shortest route went through it, so those are repaired instead of
+# recomputing the whole field.
+class DistanceField():
+    def __init__(self, goal, visited=0, board=DEFAULT_BOARD):
+        self.goal = goal
+        self.visited = visited
+        self.board = board
+        self.dist = _bfs_distances(goal, visited, board)
+
+    def rebuild(self, visited):
+        self.visited = visited
+        self.dist = _bfs_distances(self.goal, visited, self.board)
+
+    # Bring the field in line with a new visited mask. A single new square
+    # is repaired incrementally, anything else is rebuilt from scratch.
+    def sync(self, visited):
+        added = visited & ~self.visited
+        if added == 0 and visited == self.visited:
+            return
+        if visited & self.visited == self.visited and added & (added - 1) == 0:
+            self.block(added.bit_length() - 1)
+        else:
+            self.rebuild(visited)
+
+    def block(self, blocked):
+        if (self.visited >> blocked) & 1:
+            return
+        self.visited |= 1 << blocked
+        dist = self.dist
+        if dist[blocked] == UNREACHABLE:
+            return
+        if blocked == self.goal:
+            self.dist = [UNREACHABLE] * self.board.num_squares
+            return
+
+        dist[blocked] = UNREACHABLE
+        attacks = self.board.knight_attacks
+        open_mask = ~self.visited
+
+        # Collect the squares that lost their last shortest-path parent,
+        # level by level outwards from the blocked square
+        invalid = 0
+        queue = deque(squares(attacks[blocked] & open_mask))
+        while queue:
+            square = queue.popleft()
+            if square == self.goal or (invalid >> square) & 1 or dist[square] == UNREACHABLE:
+                continue
+            parent = dist[square] - 1
+            supported = False
+            for neighbour in squares(attacks[square] & open_mask & ~invalid):
+                if dist[neighbour] == parent:
+                    supported = True
+                    break
+            if supported:
+                continue
+            invalid |= 1 << square
+            child = dist[square] + 1
+            for neighbour in squares(attacks[square] & open_mask):
+                if dist[neighbour] == child:
+                    queue.append(neighbour)
+
+        if not invalid:
+            return
+
+        # Re-seed the invalidated squares from their still valid neighbours
+        # and settle them in distance order
+        frontier = []
+        for square in squares(invalid):
+            best = UNREACHABLE
+            for neighbour in squares(attacks[square] & open_mask & ~invalid):
+                if dist[neighbour] + 1 < best:
+                    best = dist[neighbour] + 1
+            dist[square] = best
+            if best < UNREACHABLE:
+                heappush(frontier, (best, square))
+        while frontier:
+            d, square = heappop(frontier)
+            if d > dist[square]:
+                continue
+            for neighbour in squares(attacks[square] & invalid):
+                if d + 1 < dist[neighbour]:
+                    dist[neighbour] = d + 1
+                    heappush(frontier, (d + 1, neighbour))
+
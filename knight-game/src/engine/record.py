@@ -0,0 +1,203 @@
+# Binary game records
+#
+# A corpus file is RECORD_MAGIC followed by any number of records, so new
+# games are simply appended. Each record is a fixed header and a body:
+#
+#   header  body length (u32), board size (u16), first side (u8),
+#           flags (u8), number of moves (u32)
+#   body    start square, goal square, one square per move, then one
+#           half-precision think time in seconds per move if FLAG_TIMES
+#
+# Squares take one byte on boards of up to 16x16 (the 8x8 default
+# included) and two bytes on larger boards. The body length lets a reader
+# skip a record without decoding it, so corpora of millions of games can
+# be counted, indexed and read one record at a time through an mmap.
+
+import mmap
+import os
+import struct
+from array import array
+
+from .board import GameState, get_board
+
+RECORD_MAGIC = b"KNREC001"
+RECORD_HEADER = struct.Struct("<IHBBI")
+
+FLAG_WINNER = 1  # set when the winner is the AI side, clear for PLAYER
+FLAG_TIMES = 2   # think times follow the moves
+
+# Bytes per square index on an NxN board
+def square_width(size):
+    return 1 if size * size <= 256 else 2
+
+_SQUARE_CODES = {1: "B", 2: "H"}
+
+
+# One finished game. `moves` are square indices in the order played,
+# starting with `first_side`; `think_times` are seconds per move or None.
+class GameRecord():
+    __slots__ = ("size", "start", "goal", "first_side", "moves", "winner", "think_times")
+
+    def __init__(self, size, start, goal, first_side, moves, winner, think_times=None):
+        self.size = size
+        self.start = start
+        self.goal = goal
+        self.first_side = first_side
+        self.moves = list(moves)
+        self.winner = winner
+        self.think_times = list(think_times) if think_times is not None else None
+
+    def __repr__(self):
+        return (f"GameRecord(size={self.size}, start={self.start}, goal={self.goal}, first_side={self.first_side}, "
+                f"moves={len(self.moves)}, winner={self.winner})")
+
+    def initial_state(self):
+        return GameState(self.start, self.goal, side=self.first_side, board=get_board(self.size))
+
+    # The position before the first move and after every move
+    def states(self):
+        state = self.initial_state()
+        yield state.copy()
+        for square in self.moves:
+            state.play(square)
+            yield state.copy()
+
+    def to_bytes(self):
+        code = _SQUARE_CODES[square_width(self.size)]
+        count = len(self.moves)
+        body = struct.pack(f"<{count + 2}{code}", self.start, self.goal, *self.moves)
+        flags = FLAG_WINNER if self.winner else 0
+        if self.think_times is not None:
+            flags |= FLAG_TIMES
+            # Half floats overflow at 65504 seconds
+            body += struct.pack(f"<{count}e", *(min(t, 65504.0) for t in self.think_times))
+        return RECORD_HEADER.pack(len(body), self.size, self.first_side, flags, count) + body
+
+    # Decode the record at `offset` of `buffer` (bytes, mmap or memoryview).
+    # Returns the record and the offset just past it.
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        length, size, first_side, flags, count = RECORD_HEADER.unpack_from(buffer, offset)
+        body = offset + RECORD_HEADER.size
+        code = _SQUARE_CODES[square_width(size)]
+        squares = struct.unpack_from(f"<{count + 2}{code}", buffer, body)
+        think_times = None
+        if flags & FLAG_TIMES:
+            think_times = struct.unpack_from(f"<{count}e", buffer, body + (count + 2) * square_width(size))
+        record = cls(size, squares[0], squares[1], first_side, squares[2:], flags & FLAG_WINNER, think_times)
+        return record, body + length
+
+
+# Appends records to a corpus file, writing the magic if the file is new
+class RecordWriter():
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(RECORD_MAGIC)
+        self.count = 0
+
+    def write(self, record):
+        self.write_bytes(record.to_bytes())
+
+    # Append a record already encoded with GameRecord.to_bytes()
+    def write_bytes(self, data):
+        self.file.write(data)
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Read-only view of a corpus file through mmap. Iterating decodes one
+# record at a time; indexing by game number builds an offset table of
+# 8 bytes per game on first use. A record cut short at the end of the
+# file, as left by an interrupted write, is ignored.
+class RecordCorpus():
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = None
+        self._offsets = None
+        if os.fstat(self._file.fileno()).st_size > len(RECORD_MAGIC):
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic = self._map[:len(RECORD_MAGIC)] if self._map is not None else self._file.read(len(RECORD_MAGIC))
+        if magic != RECORD_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game record corpus")
+
+    def close(self):
+        if self._file is not None:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Offset of every record, found by hopping over the body lengths
+    def offsets(self):
+        if self._offsets is None:
+            offsets = array("Q")
+            if self._map is not None:
+                buffer = self._map
+                offset = len(RECORD_MAGIC)
+                end = len(buffer)
+                while offset + RECORD_HEADER.size <= end:
+                    next_offset = offset + RECORD_HEADER.size + RECORD_HEADER.unpack_from(buffer, offset)[0]
+                    if next_offset > end:
+                        break
+                    offsets.append(offset)
+                    offset = next_offset
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        return len(self.offsets())
+
+    def __getitem__(self, index):
+        return GameRecord.from_buffer(self._map, self.offsets()[index])[0]
+
+    def __iter__(self):
+        if self._map is None:
+            return
+        buffer = self._map
+        offset = len(RECORD_MAGIC)
+        end = len(buffer)
+        while offset + RECORD_HEADER.size <= end:
+            if offset + RECORD_HEADER.size + RECORD_HEADER.unpack_from(buffer, offset)[0] > end:
+                return
+            record, offset = GameRecord.from_buffer(buffer, offset)
+            yield record
+
+
+# Records from a file object read front to back, for pipes and other
+# streams that cannot be memory-mapped
+def stream_records(f):
+    if f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+        raise ValueError("not a game record corpus")
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        length = RECORD_HEADER.unpack(header)[0]
+        body = f.read(length)
+        if len(body) < length:
+            return
+        yield GameRecord.from_buffer(header + body)[0]
@@ -0,0 +1,137 @@
+# Game rules on (x, y) board coordinates, for the GUI and tools that work
+# with positions rather than square indices. Every function takes the board
+# size as an optional last argument and defaults to 8x8. `visited` is either
+# a square bitmask or, as in the original game code, any collection of
+# (x, y) positions.
+
+import math
+import time
+
+from .board import GameState, PLAYER, AI, DEFAULT_BOARD_SIZE, get_board, squares, is_legal, mask_of
+from .instrument import instruments
+from .pathfind import a_star
+from .search import Searcher, INFINITY
+from .mcts import MCTSSearcher
+
+# Searchers used when the caller passes none. They are made on first use,
+# so importing the engine does not allocate a transposition table.
+default_searcher = None
+default_mcts_searcher = None
+
+def get_default_searcher():
+    global default_searcher
+    if default_searcher is None:
+        default_searcher = Searcher()
+    return default_searcher
+
+def get_default_mcts_searcher():
+    global default_mcts_searcher
+    if default_mcts_searcher is None:
+        default_mcts_searcher = MCTSSearcher()
+    return default_mcts_searcher
+
+# Visited squares as a bitmask, from a bitmask or a collection of positions
+def _visited_mask(visited, board):
+    if isinstance(visited, int):
+        return visited
+    return mask_of(visited, board)
+
+# Function to check if a move is valid for a knight considering visited tiles
+def is_valid_knight_move(start, end, visited, size=DEFAULT_BOARD_SIZE):
+    if not (0 <= start[0] < size and 0 <= start[1] < size and 0 <= end[0] < size and 0 <= end[1] < size):
+        return False
+    board = get_board(size)
+    return is_legal(start[1] * size + start[0], end[1] * size + end[0], _visited_mask(visited, board), board)
+
+# A* search algorithm, using exact knight distances as the heuristic
+def a_star_search(start, goal, visited, size=DEFAULT_BOARD_SIZE):
+    if start == goal:
+        return [start]
+    board = get_board(size)
+    start_square = board.to_square(start)
+    visited = _visited_mask(visited, board)
+    if instruments.enabled:
+        started = time.perf_counter()
+        path = a_star(start_square, board.to_square(goal), visited & ~(1 << start_square), board)
+        instruments.observe("a_star_search", (time.perf_counter() - started) * 1000)
+    else:
+        path = a_star(start_square, board.to_square(goal), visited & ~(1 << start_square), board)
+    return [board.to_pos(square) for square in path]
+
+# Minimax with alpha-beta pruning, searched as negamax from the side to move.
+# Iterates up to `depth` plies, or less if `time_limit` seconds run out first.
+def minimax(position, goal_pos, depth, alpha, beta, maximizing_player, visited, time_limit=None, searcher=None,
+            size=DEFAULT_BOARD_SIZE):
+    searcher = searcher or get_default_searcher()
+    board = get_board(size)
+    side = AI if maximizing_player else PLAYER
+    knight = board.to_square(position)
+    state = GameState(knight, board.to_square(goal_pos), _visited_mask(visited, board) | (1 << knight), side, board)
+    result = searcher.search(state, max_depth=depth, time_limit=time_limit,
+                             alpha=max(alpha, -INFINITY), beta=min(beta, INFINITY))
+    best_move = board.to_pos(result.move) if result.move is not None else None
+    score = result.score if maximizing_player else -result.score
+    return score, best_move
+
+# Monte Carlo tree search for `time_limit` seconds, as an anytime
+# alternative to minimax() with the same (score, best_move) result. The
+# searcher keeps its tree, so calling it again after the opponent's reply
+# continues from the statistics it already has.
+def mcts_search(position, goal_pos, maximizing_player, visited, time_limit=1.0, searcher=None, size=DEFAULT_BOARD_SIZE):
+    searcher = searcher or get_default_mcts_searcher()
+    board = get_board(size)
+    side = AI if maximizing_player else PLAYER
+    knight = board.to_square(position)
+    state = GameState(knight, board.to_square(goal_pos), _visited_mask(visited, board) | (1 << knight), side, board)
+    result = searcher.search(state, time_limit=time_limit)
+    best_move = board.to_pos(result.move) if result.move is not None else None
+    score = result.score if maximizing_player else -result.score
+    return score, best_move
+
+# Heuristic function
+def heuristic(position, goal_pos):
+    dx = position[0] - goal_pos[0]
+    dy = position[1] - goal_pos[1]
+    return math.sqrt(dx ** 2 + dy ** 2)
+
+# Generate all possible knight moves from a position
+def generate_knight_moves(position, size=DEFAULT_BOARD_SIZE):
+    attacks = get_board(size).knight_attacks[position[1] * size + position[0]]
+    return [(square % size, square // size) for square in squares(attacks)]
+
+# Column letters as in spreadsheets: A to Z, then AA, AB and so on
+def column_name(col):
+    name = ""
+    col += 1
+    while col:
+        col, rest = divmod(col - 1, 26)
+        name = chr(ord("A") + rest) + name
+    return name
+
+# Helper function to convert board coordinates to chess notation. Row 0 is
+# the top of the board, which is the highest rank.
+def to_chess_notation(pos, size=DEFAULT_BOARD_SIZE):
+    col, row = pos
+    return f"{column_name(col)}{size - row}"
+
+def is_white_tile(pos):
+    x, y = pos
+    return (x + y) % 2 == 0
+
+def generate_position_ranges(size=DEFAULT_BOARD_SIZE):
+    knight_pos_white = []
+    goal_pos_white = [] 
+    knight_pos_black = [] 
+    goal_pos_black = [] 
+    
+    for x in range(size):
+        for y in range(size):
+            pos = (x, y)
+            if is_white_tile(pos):
+                knight_pos_white.append(pos)
+                goal_pos_white.append(pos)
+            else:
+                knight_pos_black.append(pos)
+                goal_pos_black.append(pos)
+                
+    return knight_pos_white, knight_pos_black, goal_pos_white, goal_pos_black
@@ -0,0 +1,439 @@
+# Negamax search with alpha-beta pruning, Zobrist hashing, a transposition
+# table and iterative deepening under a time or node budget.
+#
+# Both sides move the same knight. Landing on the goal wins, and a side
+# with no legal move loses, so every score is from the point of view of
+# the side to move.
+
+import os
+import random
+import time
+
+from .board import DEFAULT_BOARD, get_board, popcount, squares
+from .instrument import instruments
+from .pathfind import goal_distance
+
+WIN_SCORE = 100000
+WIN_THRESHOLD = WIN_SCORE - 1000
+INFINITY = WIN_SCORE + 1
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+MAX_DEPTH = 64
+
+# The budget is checked every BUDGET_CHECK_SQUARES // num_squares nodes,
+# rounded down to a power of two. A leaf costs a breadth-first search over
+# the whole board, so large boards check often enough to stop within about
+# a millisecond of the deadline, down to every node from 128x128.
+BUDGET_CHECK_SQUARES = 16384
+
+# Zobrist keys for (knight square, goal square, visited squares, side to
+# move). Each table draws from its own seeded stream and grows when a larger
+# board is searched, so the key of a square never depends on which board
+# sizes were searched before, in this process or in a pool worker.
+_rng = random.Random(0x4B4E49474854)
+ZOBRIST_SIDE = _rng.getrandbits(64)
+_zobrist_rngs = [random.Random(_rng.getrandbits(64)) for _ in range(3)]
+ZOBRIST_KNIGHT = []
+ZOBRIST_GOAL = []
+ZOBRIST_VISITED = []
+
+def _ensure_zobrist(num_squares):
+    for table, rng in zip((ZOBRIST_KNIGHT, ZOBRIST_GOAL, ZOBRIST_VISITED), _zobrist_rngs):
+        while len(table) < num_squares:
+            table.append(rng.getrandbits(64))
+
+_ensure_zobrist(DEFAULT_BOARD.num_squares)
+
+_SIZE_MIX = 0x9E3779B97F4A7C15
+_KEY_MASK = (1 << 64) - 1
+
+def zobrist_hash(state):
+    _ensure_zobrist(state.board.num_squares)
+    # The board size is mixed in so boards of different sizes can share a table
+    key = ZOBRIST_KNIGHT[state.knight] ^ ZOBRIST_GOAL[state.goal] ^ ((state.board.size * _SIZE_MIX) & _KEY_MASK)
+    for square in squares(state.visited):
+        key ^= ZOBRIST_VISITED[square]
+    if state.side:
+        key ^= ZOBRIST_SIDE
+    return key
+
+# Hash of the position after the knight moves from `knight` to `square`
+def child_hash(key, knight, square):
+    return key ^ ZOBRIST_KNIGHT[knight] ^ ZOBRIST_KNIGHT[square] ^ ZOBRIST_VISITED[square] ^ ZOBRIST_SIDE
+
+
+# Fixed-size transposition table. Each slot holds
+# (key, depth, flag, score, move, generation). A slot is overwritten when it
+# is empty, left over from an older search, or the new entry searched at
+# least as deep.
+class TranspositionTable():
+    def __init__(self, size_bits=18):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or entry[0] == key or depth >= entry[1]:
+            self.slots[index] = (key, depth, flag, score, move, self.generation)
+            self.stores += 1
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Outcome of one call to Searcher.search
+class SearchResult():
+    def __init__(self, move, score, depth, nodes, elapsed):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"SearchResult(move={self.move}, score={self.score}, depth={self.depth}, nodes={self.nodes}, elapsed={self.elapsed:.3f}s)"
+
+
+# Static evaluation from the point of view of the side to move. A short
+# path of odd length means the side to move would land on the goal first.
+def evaluate(state):
+    distance = goal_distance(state.knight, state.goal, state.visited, state.board)
+    mobility = popcount(state.board.knight_attacks[state.knight] & ~state.visited)
+    if distance is None:
+        return mobility
+    score = 1000 - 10 * distance
+    return (score if distance % 2 == 1 else -score) + mobility
+
+# Mate scores are stored relative to the node so they stay valid when the
+# same position is reached at a different ply
+def _to_table(score, ply):
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+def _from_table(score, ply):
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+class Searcher():
+    def __init__(self, table=None, evaluate=evaluate):
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.nodes = 0
+        self.cutoffs = 0
+        self.deadline = None
+        self.node_limit = None
+        self.root_order = None
+        self.stop = None
+        self.use_board(DEFAULT_BOARD)
+
+    # Board of the positions searched next
+    def use_board(self, board):
+        self.board = board
+        self.attacks = board.knight_attacks
+        self.check_mask = (1 << max(0, (BUDGET_CHECK_SQUARES // board.num_squares).bit_length() - 1)) - 1
+
+    def _check_budget(self):
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def negamax(self, knight, goal, visited, key, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & self.check_mask == 0:
+            self._check_budget()
+
+        moves = self.attacks[knight] & ~visited
+        if (moves >> goal) & 1:
+            return WIN_SCORE - ply - 1, goal
+        if not moves:
+            return -(WIN_SCORE - ply), None
+
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            tt_move = entry[4]
+            # Only trust scores from the current search so results do not
+            # depend on what earlier searches left in the table
+            if entry[1] >= depth and entry[5] == self.table.generation:
+                score = _from_table(entry[3], ply)
+                flag = entry[2]
+                if flag == EXACT:
+                    return score, tt_move
+                if flag == LOWER and score > alpha:
+                    alpha = score
+                elif flag == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    self.cutoffs += 1
+                    return score, tt_move
+
+        if depth == 0:
+            return self.evaluate(_LeafState(knight, goal, visited, self.board)), None
+
+        if ply == 0 and self.root_order:
+            ordered = [square for square in self.root_order if (moves >> square) & 1]
+        else:
+            ordered = list(squares(moves))
+        if tt_move is not None and (moves >> tt_move) & 1:
+            ordered.remove(tt_move)
+            ordered.insert(0, tt_move)
+
+        best_score = -INFINITY
+        best_move = None
+        for square in ordered:
+            score, _ = self.negamax(square, goal, visited | (1 << square), child_hash(key, knight, square),
+                                    depth - 1, -beta, -alpha, ply + 1)
+            score = -score
+            if score > best_score:
+                best_score = score
+                best_move = square
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.cutoffs += 1
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, flag, _to_table(best_score, ply), best_move)
+        return best_score, best_move
+
+    # Iterative deepening from depth 1 up to `max_depth`. Stops early when
+    # the time or node budget runs out and returns the deepest completed
+    # iteration. An optional DistanceField for the position orders the root
+    # moves closest to the goal first. Setting the optional `stop` event
+    # (a threading.Event or anything else with is_set()) ends the search
+    # early like a timeout.
+    def search(self, state, max_depth=MAX_DEPTH, time_limit=None, node_limit=None, alpha=-INFINITY, beta=INFINITY,
+               field=None, stop=None):
+        start = time.perf_counter()
+        self.nodes = 0
+        self.cutoffs = 0
+        table_hits = self.table.hits
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.stop = stop
+        self.use_board(state.board)
+        self.table.new_search()
+        if field is not None:
+            field.sync(state.visited)
+            self.root_order = sorted(squares(state.moves()), key=lambda square: field.dist[square])
+        else:
+            self.root_order = None
+
+        key = zobrist_hash(state)
+        best_move = None
+        best_score = 0
+        completed = 0
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self.negamax(state.knight, state.goal, state.visited, key, depth, alpha, beta, 0)
+            except SearchTimeout:
+                break
+            best_score, best_move, completed = score, move, depth
+            # A forced result needs no deeper search
+            if abs(score) > WIN_THRESHOLD or move is None:
+                break
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                break
+
+        # Fall back to any legal move if not even depth 1 finished
+        if best_move is None:
+            moves = state.moves()
+            if moves:
+                best_move = next(squares(moves))
+
+        result = SearchResult(best_move, best_score, completed, self.nodes, time.perf_counter() - start)
+        if instruments.enabled:
+            instruments.record_search("alphabeta", result, tt_hits=self.table.hits - table_hits, cutoffs=self.cutoffs)
+        return result
+
+
+# Lightweight stand-in for GameState handed to the evaluation function
+class _LeafState():
+    __slots__ = ("knight", "goal", "visited", "board")
+
+    def __init__(self, knight, goal, visited, board):
+        self.knight = knight
+        self.goal = goal
+        self.visited = visited
+        self.board = board
+
+
+# Process pool workers keep one table each, reused across tasks
+_worker_searcher = None
+
+def _init_worker(size_bits):
+    global _worker_searcher
+    _worker_searcher = Searcher(TranspositionTable(size_bits))
+
+# Score one root move to `depth` plies in a worker. Returns the move, its
+# score from the root side's point of view (None on timeout) and the nodes
+# searched.
+def _search_root_move(size, knight, goal, visited, key, square, depth, alpha, generation, time_limit):
+    searcher = _worker_searcher
+    board = get_board(size)
+    _ensure_zobrist(board.num_squares)
+    searcher.use_board(board)
+    searcher.table.generation = generation
+    searcher.nodes = 0
+    searcher.node_limit = None
+    searcher.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    try:
+        score, _ = searcher.negamax(square, goal, visited | (1 << square), child_hash(key, knight, square),
+                                    depth - 1, -INFINITY, -alpha, 1)
+    except SearchTimeout:
+        return square, None, searcher.nodes
+    return square, -score, searcher.nodes
+
+
+# Root-split parallel search. The first root move is searched on its own to
+# get a bound, then the remaining moves are searched in parallel against it.
+# Moves are tried in the same order as Searcher.search and ties go to the
+# earlier move, so at a fixed depth the chosen move and score match the
+# single-process search.
+class ParallelSearcher():
+    def __init__(self, workers=None, size_bits=18):
+        # Imported here because multiprocessing adds noticeably to the
+        # engine's import time and only the parallel searchers need it
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing.util import Finalize
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(size_bits,))
+        # A process that is itself a pool worker, like the game's AI worker,
+        # waits for its children at exit without shutting their pool down.
+        # This runs ahead of the pool queues' own exit finalizers, which
+        # have priority 10.
+        Finalize(self, self.pool.shutdown, kwargs={"cancel_futures": True}, exitpriority=100)
+        self.generation = 0
+        self.nodes = 0
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+        return max(deadline - time.perf_counter(), 0.0)
+
+    # Search every root move to `depth`, or return None if time ran out or
+    # the search was stopped
+    def _search_depth(self, state, key, ordered, depth, deadline, stop):
+        args = (state.board.size, state.knight, state.goal, state.visited, key)
+        first = self.pool.submit(_search_root_move, *args, ordered[0], depth, -INFINITY, self.generation,
+                                 self._remaining(deadline)).result()
+        self.nodes += first[2]
+        if first[1] is None:
+            return None
+        best_move, best_score = first[0], first[1]
+        if stop is not None and stop.is_set():
+            return None
+
+        futures = [self.pool.submit(_search_root_move, *args, square, depth, best_score, self.generation,
+                                    self._remaining(deadline))
+                   for square in ordered[1:]]
+        timed_out = False
+        for future in futures:
+            if stop is not None and stop.is_set():
+                for pending in futures:
+                    pending.cancel()
+                return None
+            square, score, nodes = future.result()
+            self.nodes += nodes
+            if score is None:
+                timed_out = True
+            elif score > best_score:
+                best_move, best_score = square, score
+        if timed_out:
+            return None
+        return best_score, best_move
+
+    def search(self, state, max_depth=MAX_DEPTH, time_limit=None, field=None, stop=None):
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit is not None else None
+        self.nodes = 0
+        self.generation += 1
+
+        moves = state.moves()
+        if (moves >> state.goal) & 1:
+            return SearchResult(state.goal, WIN_SCORE - 1, 1, 1, time.perf_counter() - start)
+        if not moves:
+            return SearchResult(None, -WIN_SCORE, 0, 1, time.perf_counter() - start)
+
+        if field is not None:
+            field.sync(state.visited)
+            order = sorted(squares(moves), key=lambda square: field.dist[square])
+        else:
+            order = list(squares(moves))
+
+        key = zobrist_hash(state)
+        best_move = None
+        best_score = 0
+        completed = 0
+        for depth in range(1, max_depth + 1):
+            ordered = list(order)
+            if best_move is not None:
+                ordered.remove(best_move)
+                ordered.insert(0, best_move)
+            result = self._search_depth(state, key, ordered, depth, deadline, stop)
+            if result is None:
+                break
+            best_score, best_move = result
+            completed = depth
+            if abs(best_score) > WIN_THRESHOLD:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        if best_move is None:
+            best_move = order[0]
+
+        result = SearchResult(best_move, best_score, completed, self.nodes, time.perf_counter() - start)
+        if instruments.enabled:
+            instruments.record_search("parallel", result, workers=self.workers)
+        return result
@@ -0,0 +1,289 @@
+# Exact solver for small endgames
+#
+# Only the unvisited squares the knight can still reach matter to the rest
+# of the game, and both sides move the same knight, so a position is fully
+# described by (knight square, goal square, reachable region) with the
+# score taken from the side to move. The goal is dropped from the key when
+# it is outside the region, since nobody can reach it any more.
+#
+# Positions whose region has at most `threshold` squares are solved
+# exactly by depth-first search. Results are memoised under a 64-bit hash
+# of the position mapped to its smallest form under the eight symmetries
+# of the board, and can be saved to a compact file that is memory-mapped
+# and binary-searched, so a solved position costs one lookup.
+#
+# A result is packed into one small int: 2 * plies + 1 for a win of the
+# side to move in that many plies, 2 * plies for a loss.
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+
+from .board import DEFAULT_BOARD, get_board, popcount, squares
+from .instrument import instruments
+from .search import WIN_SCORE, SearchResult
+
+DEFAULT_THRESHOLD = 20
+
+STORE_MAGIC = b"KNSOLVE1"
+# magic, board size, threshold, reserved, number of entries
+STORE_HEADER = struct.Struct("<8sHHIQ")
+
+
+def encode(win, plies):
+    return 2 * plies + (1 if win else 0)
+
+def is_win(value):
+    return value & 1 == 1
+
+def plies(value):
+    return value >> 1
+
+# Search-style score of a solved value: wins closer to the root score
+# higher, losses further away score less badly
+def value_score(value):
+    return WIN_SCORE - plies(value) if is_win(value) else -(WIN_SCORE - plies(value))
+
+
+# Square permutations of the eight rotations and reflections of the board
+def _build_symmetries(board):
+    size = board.size
+    last = size - 1
+    maps = [
+        lambda x, y: (x, y), lambda x, y: (last - x, y), lambda x, y: (x, last - y), lambda x, y: (last - x, last - y),
+        lambda x, y: (y, x), lambda x, y: (last - y, x), lambda x, y: (y, last - x), lambda x, y: (last - y, last - x),
+    ]
+    symmetries = []
+    for transform in maps:
+        perm = []
+        for square in range(board.num_squares):
+            x, y = transform(*board.to_pos(square))
+            perm.append(y * size + x)
+        symmetries.append(tuple(perm))
+    return symmetries
+
+_symmetries = {}
+
+def symmetries(board):
+    table = _symmetries.get(board.size)
+    if table is None:
+        table = _symmetries[board.size] = _build_symmetries(board)
+    return table
+
+# Unvisited squares reachable from `knight`, where `open_mask` holds the
+# unvisited squares
+def reachable_region(knight, open_mask, board=DEFAULT_BOARD):
+    spread = board.spread
+    reached = 0
+    frontier = 1 << knight
+    while frontier:
+        frontier = spread(frontier) & open_mask & ~reached
+        reached |= frontier
+    return reached
+
+# Stable 64-bit key of a position, the same for all of its symmetric forms.
+# `goal` is None when it lies outside the region.
+def canonical_key(knight, goal, region, board=DEFAULT_BOARD):
+    region_squares = list(squares(region))
+    best = None
+    for perm in symmetries(board):
+        mask = 0
+        for square in region_squares:
+            mask |= 1 << perm[square]
+        form = (perm[knight], perm[goal] if goal is not None else -1, mask)
+        if best is None or form < best:
+            best = form
+    knight, goal, mask = best
+    length = (board.num_squares + 7) // 8
+    data = struct.pack("<Hii", board.size, knight, goal) + mask.to_bytes(length, "little")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+# Sorted key/value file opened with mmap. Lookups binary-search the keys
+# in place, so opening a store costs nothing however large it is.
+class SolvedStore():
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.threshold, _, self.count = STORE_HEADER.unpack_from(self._map, 0)
+        if magic != STORE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a solved position store")
+        view = memoryview(self._map)
+        keys_end = STORE_HEADER.size + 8 * self.count
+        self.keys = view[STORE_HEADER.size:keys_end].cast("Q")
+        self.values = view[keys_end:keys_end + 2 * self.count].cast("H")
+
+    def __len__(self):
+        return self.count
+
+    def get(self, key):
+        index = bisect_left(self.keys, key)
+        if index < self.count and self.keys[index] == key:
+            return self.values[index]
+        return None
+
+    def items(self):
+        return zip(self.keys, self.values)
+
+    def close(self):
+        if self._map is not None:
+            self.keys = self.values = None
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Write `entries` (key -> value) to `path`, merged with what the file
+    # already holds. The new file replaces the old one in a single rename.
+    @staticmethod
+    def write(path, entries, size, threshold):
+        merged = dict(entries)
+        if os.path.exists(path):
+            with SolvedStore(path) as old:
+                if old.size != size:
+                    raise ValueError(f"{path} holds {old.size}x{old.size} positions, not {size}x{size}")
+                threshold = max(threshold, old.threshold)
+                for key, value in old.items():
+                    merged.setdefault(key, value)
+        keys = array("Q", sorted(merged))
+        values = array("H", (merged[key] for key in keys))
+        temp = f"{path}.tmp"
+        with open(temp, "wb") as f:
+            f.write(STORE_HEADER.pack(STORE_MAGIC, size, threshold, 0, len(keys)))
+            f.write(keys.tobytes())
+            f.write(values.tobytes())
+        os.replace(temp, path)
+        return len(keys)
+
+
+# Depth-first solver for positions with at most `threshold` reachable
+# squares. New results go to `memo`; `store` is an optional SolvedStore
+# that is consulted first.
+class Solver():
+    def __init__(self, board=DEFAULT_BOARD, threshold=DEFAULT_THRESHOLD, store=None):
+        if store is not None and store.size != board.size:
+            raise ValueError(f"store holds {store.size}x{store.size} positions, not {board.size}x{board.size}")
+        self.board = board
+        self.threshold = threshold
+        self.store = store
+        self.memo = {}
+        self.nodes = 0
+
+    @classmethod
+    def open(cls, path, threshold=None):
+        store = SolvedStore(path)
+        return cls(get_board(store.size), threshold if threshold is not None else store.threshold, store)
+
+    def save(self, path):
+        return SolvedStore.write(path, self.memo, self.board.size, self.threshold)
+
+    # Region of `state`, or None if it is too large to solve
+    def region(self, state):
+        if state.board is not self.board:
+            return None
+        region = reachable_region(state.knight, ~state.visited & self.board.full_mask, self.board)
+        if popcount(region) > self.threshold:
+            return None
+        return region
+
+    def lookup(self, key):
+        value = self.memo.get(key)
+        if value is None and self.store is not None:
+            value = self.store.get(key)
+        return value
+
+    def solve_region(self, knight, goal, region):
+        if goal is not None and not (region >> goal) & 1:
+            goal = None
+        key = canonical_key(knight, goal, region, self.board)
+        value = self.lookup(key)
+        if value is None:
+            value = self._solve(knight, goal, region)
+            self.memo[key] = value
+        return value
+
+    def _solve(self, knight, goal, region):
+        self.nodes += 1
+        moves = self.board.knight_attacks[knight] & region
+        if goal is not None and (moves >> goal) & 1:
+            return encode(True, 1)
+        if not moves:
+            return encode(False, 0)
+
+        best = None
+        for square in squares(moves):
+            child = self._child_value(square, goal, region)
+            value = encode(not is_win(child), plies(child) + 1)
+            if best is None or _better(value, best):
+                best = value
+        return best
+
+    def _child_value(self, square, goal, region):
+        child_region = reachable_region(square, region & ~(1 << square), self.board)
+        return self.solve_region(square, goal, child_region)
+
+    # Exact value of `state`, or None if its region is over the threshold
+    def solve(self, state):
+        region = self.region(state)
+        if region is None:
+            return None
+        return self.solve_region(state.knight, state.goal, region)
+
+    # Best move of `state` with its value, or None if the position is too
+    # large to solve or has no legal move
+    def best_move(self, state):
+        region = self.region(state)
+        if region is None:
+            return None
+        moves = state.moves()
+        if (moves >> state.goal) & 1:
+            return state.goal, encode(True, 1)
+        best = None
+        for square in squares(moves):
+            child = self._child_value(square, state.goal, region)
+            value = encode(not is_win(child), plies(child) + 1)
+            if best is None or _better(value, best[1]):
+                best = (square, value)
+        return best
+
+# Prefer wins over losses, quick wins over slow ones and slow losses over
+# quick ones
+def _better(value, other):
+    if is_win(value) != is_win(other):
+        return is_win(value)
+    if is_win(value):
+        return plies(value) < plies(other)
+    return plies(value) > plies(other)
+
+
+# Searcher front end for the AI: positions small enough for the solver are
+# answered exactly, everything else goes to `fallback` (a Searcher or
+# ParallelSearcher) with the same arguments.
+class SolvedSearcher():
+    def __init__(self, solver, fallback):
+        self.solver = solver
+        self.fallback = fallback
+
+    def search(self, state, **kwargs):
+        start = time.perf_counter()
+        nodes = self.solver.nodes
+        best = self.solver.best_move(state)
+        if best is None:
+            return self.fallback.search(state, **kwargs)
+        move, value = best
+        result = SearchResult(move, value_score(value), plies(value), self.solver.nodes - nodes,
+                              time.perf_counter() - start)
+        if instruments.enabled:
+            instruments.record_search("solver", result, memo_size=len(self.solver.memo))
+        return result
@@ -0,0 +1,110 @@
+# Load generator for server.py
+#
+# Opens a number of client connections and plays games on each of them
+# back to back until the total is reached, with random legal moves for
+# the player side. Reports the games finished per second and the p50/p99
+# latency of move requests as the clients see them, then the server's own
+# stats.
+#
+#   python server.py --tcp 127.0.0.1:8765 --workers 4 &
+#   python loadgen.py --tcp 127.0.0.1:8765 --clients 64 --games 2000 --think-time 0.02
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from engine.board import DEFAULT_BOARD_SIZE
+from server import DEFAULT_ADDRESS, parse_address, percentile
+
+
+async def _connect(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    host, port = parse_address(args.tcp)
+    return await asyncio.open_connection(host, port)
+
+async def _request(reader, writer, request):
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    return json.loads(line)
+
+
+class LoadStats():
+    def __init__(self):
+        self.games = 0
+        self.wins = {"player": 0, "ai": 0}
+        self.moves = 0
+        self.errors = 0
+        self.latencies = []
+
+
+async def _client(index, args, remaining, stats):
+    rng = random.Random(f"{args.seed}:{index}")
+    reader, writer = await _connect(args)
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            new_game = {"op": "new", "first": rng.choice(("player", "ai")), "size": args.board_size,
+                        "think_time": args.think_time, "depth": args.depth}
+            response = await _request(reader, writer, new_game)
+            while response.get("ok") and response["result"] is None:
+                move = {"op": "move", "session": response["session"], "square": rng.choice(response["moves"])}
+                started = time.perf_counter()
+                response = await _request(reader, writer, move)
+                stats.latencies.append(time.perf_counter() - started)
+                stats.moves += 1
+            if not response.get("ok"):
+                stats.errors += 1
+                continue
+            stats.games += 1
+            stats.wins[response["result"]] += 1
+    finally:
+        writer.close()
+
+async def run(args):
+    stats = LoadStats()
+    remaining = [args.games]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(index, args, remaining, stats) for index in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(stats.latencies)
+    print(f"{stats.games} games over {args.clients} connections in {elapsed:.2f}s "
+          f"({stats.games / elapsed:.1f} sessions/sec), {stats.errors} errors")
+    print(f"  {stats.moves} moves, p50 {1000 * percentile(latencies, 0.5):.1f} ms, "
+          f"p99 {1000 * percentile(latencies, 0.99):.1f} ms, max {1000 * (latencies[-1] if latencies else 0):.1f} ms")
+    print(f"  player wins {stats.wins['player']}, AI wins {stats.wins['ai']}")
+
+    reader, writer = await _connect(args)
+    try:
+        server_stats = await _request(reader, writer, {"op": "stats"})
+    finally:
+        writer.close()
+    print(f"  server: {server_stats['sessions_finished']} finished, p50 {server_stats['move_p50_ms']:.1f} ms, "
+          f"p99 {server_stats['move_p99_ms']:.1f} ms, {server_stats['workers']} workers")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many games against server.py at once.")
+    parser.add_argument("--tcp", metavar="HOST:PORT", default=DEFAULT_ADDRESS)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections")
+    parser.add_argument("--games", type=int, default=200, help="games to play in total")
+    parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE)
+    parser.add_argument("--think-time", type=float, default=0.05, help="AI think time to ask for per move")
+    parser.add_argument("--depth", type=int, default=4, help="AI depth to ask for")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
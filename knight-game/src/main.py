@@ -1,366 +1,428 @@
-import pygame
-import sys
-from button import Button
-from queue import PriorityQueue
-import math
+import argparse
+import functools
+import os
 import random
-
-# Initialize
-pygame.init()
-
-# Set up the display
-screen = pygame.display.set_mode((1280, 720))
-pygame.display.set_caption("First to Neigh Neigh")
-
-# Background image
-BG = pygame.image.load("asset/bg.png")
-
-# Load piece images
-knight_img = pygame.image.load("asset/p2.png")
-goal_img = pygame.image.load("asset/goal.png")
-
-click_sound = pygame.mixer.Sound("asset/click.mp3")
-win_sound = pygame.mixer.Sound("asset/neigh.mp3")
+import time
+import pygame
+from button import Button, ButtonGroup
+from scenes import Scene, SceneManager
+from assets import assets
+from renderer import BoardRenderer, PLAYER_TILE, AI_TILE
+from engine import PLAYER, AI, Searcher, ParallelSearcher, MCTSSearcher, ParallelMCTS, DistanceField, random_start
+from engine.board import DEFAULT_BOARD_SIZE, MIN_BOARD_SIZE, get_board
+from engine.rules import is_valid_knight_move, to_chess_notation
+from engine.solver import Solver, SolvedSearcher
+from engine.instrument import instruments
+from engine.record import GameRecord, RecordWriter, RecordCorpus
+import ai_worker
+from ai_worker import AIMoveTask
+
+# Frame rate cap for every screen loop
+FPS = 60
+
+# Width and height of the board in tiles, set with --board-size
+BOARD_SIZE = DEFAULT_BOARD_SIZE
+
+# Set by init_display() when the game window opens
+screen = None
+board_renderer = None
+board_renderers = {}
+
+# AI search settings
+AI_ENGINE = "search"  # "search" for alpha-beta or "mcts" for Monte Carlo tree search, set with --ai
+AI_THINK_TIME = 1.0  # seconds per move
+AI_WORKERS = 1  # processes for the AI turn, more than 1 splits the root moves across a pool
+SOLVED_STORE = "solved.bin"  # endgame store built by solve.py, used when present
+# Searchers by (engine, workers) and solvers by board size. The game's AI
+# searches run in the ai_worker process, which fills in its own copies.
+ai_searchers = {}
+ai_solvers = {}
+ai_store_opened = False
+
+# Finished games are appended here when --record is given
+record_writer = None
+
+# Replay speed 1.0 plays one move per REPLAY_MOVE_MS
+REPLAY_MOVE_MS = 500
+
+# Exact solver for small endgames on `board`, backed by the store when it
+# holds positions of that size. The store is opened once, on first use;
+# other sizes get a solver of their own that fills in as the game goes.
+def get_ai_solver(board, store=SOLVED_STORE):
+    global ai_store_opened
+    if not ai_store_opened:
+        ai_store_opened = True
+        if os.path.exists(store):
+            solver = Solver.open(store)
+            ai_solvers[solver.board.size] = solver
+    solver = ai_solvers.get(board.size)
+    if solver is None:
+        solver = ai_solvers[board.size] = Solver(board)
+    return solver
+
+# Solved endgames are answered from the solver, everything else is searched.
+# The settings are passed in rather than read from the globals above, since
+# this runs in the AI worker process.
+def get_ai_searcher(board, engine=AI_ENGINE, workers=AI_WORKERS, store=SOLVED_STORE):
+    searcher = ai_searchers.get((engine, workers))
+    if searcher is None:
+        if engine == "mcts":
+            searcher = MCTSSearcher() if workers <= 1 else ParallelMCTS(workers=workers)
+        else:
+            searcher = Searcher() if workers <= 1 else ParallelSearcher(workers=workers)
+        ai_searchers[(engine, workers)] = searcher
+    return SolvedSearcher(get_ai_solver(board, store), searcher)
+
+# Open the window. Only the display and font modules are started here, the
+# mixer starts the first time a sound is played.
+def init_display():
+    global screen, board_renderer
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((1280, 720))
+    pygame.display.set_caption("First to Neigh Neigh")
+    board_renderer = get_board_renderer(BOARD_SIZE)
+    return screen
+
+# One renderer per board size, so each checkerboard is drawn only once
+def get_board_renderer(size):
+    renderer = board_renderers.get(size)
+    if renderer is None:
+        renderer = board_renderers[size] = BoardRenderer(screen.get_size(), size)
+    return renderer
+
+def play_sound(name):
+    assets.sound(name).play()
 
 # Font
 def get_font(size):
-    return pygame.font.Font("asset/font1.ttf", size)
+    return assets.font(size)
 
 # Function to draw the board
 def draw_board(player_moves, ai_moves):
-    board_size = 8
-    tile_size = 80
-    total = board_size * tile_size
-    
-    offset_x = (screen.get_width() - total) // 2
-    offset_y = (screen.get_height() - total) // 2
-
-    for row in range(board_size):
-        for col in range(board_size):
-            pos = (col, row)
-            if pos in player_moves:
-                color = (255, 0, 0)  # Red for player moves
-            elif pos in ai_moves:
-                color = (0, 0, 255)  # Blue for AI moves
-            elif (row + col) % 2 == 0:
-                color = (200, 200, 200)
-            else:
-                color = (50, 50, 50)
-            pygame.draw.rect(screen, color, (offset_x + col * tile_size, offset_y + row * tile_size, tile_size, tile_size))
-    
-    return offset_x, offset_y, tile_size
-
-# Function to get board coordinates from pixel positions
-def get_board_coords(pos, offset_x, offset_y, tile_size):
-    x, y = pos
-    col = (x - offset_x) // tile_size
-    row = (y - offset_y) // tile_size
-    return col, row
-
-# Function to check if a move is valid for a knight considering visited tiles
-def is_valid_knight_move(start, end, visited):
-    dx = abs(start[0] - end[0])
-    dy = abs(start[1] - end[1])
-    if (dx, dy) in [(1, 2), (2, 1)]:
-        
-        if 0 <= end[0] < 8 and 0 <= end[1] < 8 and end not in visited:
-            return True
-    return False
-
-# A* search algorithm
-def a_star_search(start, goal, visited):
-    if start == goal:
-        return [start] 
-
-    def heuristic(a, b):
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-    frontier = PriorityQueue()
-    frontier.put((0, start))
-    came_from = {}
-    cost_so_far = {}
-    came_from[start] = None
-    cost_so_far[start] = 0
-
-    while not frontier.empty():
-        _, current = frontier.get()
-
-        if current == goal:
-            break
-
-        for dx, dy in [(1, 2), (2, 1), (-1, 2), (-2, 1), (1, -2), (2, -1), (-1, -2), (-2, -1)]:
-            next = (current[0] + dx, current[1] + dy)
-            if 0 <= next[0] < 8 and 0 <= next[1] < 8 and next not in visited:
-                new_cost = cost_so_far[current] + 1
-                if next not in cost_so_far or new_cost < cost_so_far[next]:
-                    cost_so_far[next] = new_cost
-                    priority = new_cost + heuristic(goal, next)
-                    frontier.put((priority, next))
-                    came_from[next] = current
-
-    # Reconstruct path
-    current = goal
-    path = []
-    while current != start:
-        path.append(current)
-        if current in came_from:
-            current = came_from[current]
-        else:
-            break
-    path.reverse()
-
-    return path
-
-def minimax(position, goal_pos, depth, alpha, beta, maximizing_player, visited):
-    if depth == 0 or position == goal_pos:
-        return heuristic(position, goal_pos), position
-
-    possible_moves = generate_knight_moves(position)
-
-    if maximizing_player:
-        max_eval = float('-inf')
-        best_move = None
-        for move in possible_moves:
-            if move in visited:
-                continue
-            path_to_goal = a_star_search(move, goal_pos, visited)
-            move_eval = -len(path_to_goal) if path_to_goal else float('-inf')
-            eval = move_eval
-
-            if eval > max_eval:
-                max_eval = eval
-                best_move = move
-            alpha = max(alpha, eval)
-            if beta <= alpha:
-                break
-        return max_eval, best_move
-    else:
-        min_eval = float('inf')
-        best_move = None
-        for move in possible_moves:
-            if move in visited:
-                continue
-            path_to_goal = a_star_search(move, goal_pos, visited)
-            move_eval = len(path_to_goal) if path_to_goal else float('inf')
-            eval = move_eval
-
-            if eval < min_eval:
-                min_eval = eval
-                best_move = move
-            beta = min(beta, eval)
-            if beta <= alpha:
-                break
-        return min_eval, best_move
-
-# Heuristic function
-def heuristic(position, goal_pos):
-    dx = position[0] - goal_pos[0]
-    dy = position[1] - goal_pos[1]
-    return math.sqrt(dx ** 2 + dy ** 2)
-
-# Generate all possible knight moves from a position
-def generate_knight_moves(position):
-    x, y = position
-    moves = [
-        (x + 1, y + 2), (x + 2, y + 1), (x - 1, y + 2), (x - 2, y + 1),
-        (x + 1, y - 2), (x + 2, y - 1), (x - 1, y - 2), (x - 2, y - 1)
-    ]
-    return [(mx, my) for mx, my in moves if 0 <= mx < 8 and 0 <= my < 8]
-
-# Helper function to convert board coordinates to chess notation
-def to_chess_notation(pos):
-    cols = "ABCDEFGH"
-    rows = "87654321"
-    col, row = pos
-    return f"{cols[col]}{rows[row]}"
-
-# Show the win message and ask for a new game or exit
-def show_win_message(winner):
-    win_sound.play()
-    print(f"{winner} wins!")
-    while True:
-        
-        message_text = get_font(75).render(f"{winner} wins the game!", True, "White")
+    board_renderer.draw(screen, player_moves, ai_moves)
+    return board_renderer.offset_x, board_renderer.offset_y, board_renderer.tile_size
+
+# Win message over the final board, asking for a new game or exit
+class WinScene(Scene):
+    def __init__(self, winner, first_turn, size=None):
+        self.winner = winner
+        self.first_turn = first_turn
+        self.size = size
+
+    def enter(self, manager):
+        super().enter(manager)
+        play_sound("neigh.mp3")
+        print(f"{self.winner} wins!")
+
+        message_text = get_font(75).render(f"{self.winner} wins the game!", True, "White")
         message_rect = message_text.get_rect(center=(640, 200))
         screen.blit(message_text, message_rect)
-
-        play_again_btn = Button(image=None, pos=(640, 400), text_input="PLAY AGAIN", font=get_font(75), base_color="White", hovering_color="#FFCA03")
-        exit_btn = Button(image=None, pos=(640, 550), text_input="EXIT", font=get_font(75), base_color="White", hovering_color="#CF3030")
-        win_back_btn = Button(image=None, pos=(1150, 50), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
-
-        mouse_pos = pygame.mouse.get_pos()
-
-        for button in [play_again_btn, win_back_btn, exit_btn]:
-            button.changeColor(mouse_pos)
-            button.update(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                click_sound.play()
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if play_again_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    return True
-                elif win_back_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    main_menu()
-                elif exit_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    pygame.quit()
-                    sys.exit()
-
-        pygame.display.update()
-
-def is_white_tile(pos):
-    x, y = pos
-    return (x + y) % 2 == 0
-
-def generate_position_ranges():
-    knight_pos_white = []
-    goal_pos_white = [] 
-    knight_pos_black = [] 
-    goal_pos_black = [] 
-    
-    for x in range(8):
-        for y in range(8):
-            pos = (x, y)
-            if is_white_tile(pos):
-                knight_pos_white.append(pos)
-                goal_pos_white.append(pos)
-            else:
-                knight_pos_black.append(pos)
-                goal_pos_black.append(pos)
-                
-    return knight_pos_white, knight_pos_black, goal_pos_white, goal_pos_black
-
-knight_pos_white, knight_pos_black, goal_pos_white, goal_pos_black = generate_position_ranges()
-
-# Play game function
-def play(first_turn):
-    while True:
-        if first_turn == "AI":
-            knight_pos = random.choice(knight_pos_white)  # Start position for AI
-            goal_pos = random.choice(goal_pos_black) # Goal position
-        else:
-            knight_pos = random.choice(knight_pos_black)  # Start position for player
-            goal_pos = random.choice(goal_pos_black)   # Goal position
-
-        
-        if knight_pos != goal_pos:
-            
-            if not any(is_valid_knight_move(knight_pos, goal_pos, set()) for dx, dy in generate_knight_moves((0,0))):
-                break 
-
-    current_turn = first_turn
-    player_moves = {knight_pos} if first_turn == "Player" else set()
-    ai_moves = {knight_pos} if first_turn == "AI" else set()
-    all_moves = {knight_pos}
-
-    while True:
-        play_mouse_pos = pygame.mouse.get_pos()
-
-        screen.fill("black")
-        offset_x, offset_y, tile_size = draw_board(player_moves, ai_moves)
-
-        # Draw the goal
-        screen.blit(goal_img, (offset_x + goal_pos[0] * tile_size, offset_y + goal_pos[1] * tile_size))
-        # Draw the knight
-        screen.blit(knight_img, (offset_x + knight_pos[0] * tile_size, offset_y + knight_pos[1] * tile_size))
-
-        play_back = Button(image=None, pos=(1150, 50), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
-        play_back.changeColor(play_mouse_pos)
-        play_back.update(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if play_back.checkInput(play_mouse_pos):
-                    main_menu()
-                else:
-                    if current_turn == "Player":
-                        board_pos = get_board_coords(play_mouse_pos, offset_x, offset_y, tile_size)
-                        if board_pos not in all_moves and is_valid_knight_move(knight_pos, board_pos, all_moves):
-                            knight_pos = board_pos
-                            player_moves.add(knight_pos)
-                            all_moves.add(knight_pos)
-                            click_sound.play()
-                            if knight_pos == goal_pos:
-                                if show_win_message("Player"):
-                                    play(first_turn)
-                                else:
-                                    return
-                            current_turn = "AI"
-                            print(f"Player moved to {knight_pos}")
-                    elif current_turn == "AI":
-                        _, best_move = minimax(knight_pos, goal_pos, 3, float('-inf'), float('inf'), True, all_moves)
-                        if best_move and is_valid_knight_move(knight_pos, best_move, all_moves):
-                            knight_pos = best_move
-                            ai_moves.add(knight_pos)
-                            all_moves.add(knight_pos)
-                            click_sound.play()
-                            
-                            screen.fill("black")
-                            offset_x, offset_y, tile_size = draw_board(player_moves, ai_moves)
-                            screen.blit(goal_img, (offset_x + goal_pos[0] * tile_size, offset_y + goal_pos[1] * tile_size))
-                            screen.blit(knight_img, (offset_x + knight_pos[0] * tile_size, offset_y + knight_pos[1] * tile_size))
-                            pygame.display.update()
-                            if knight_pos == goal_pos:
-                                if show_win_message("AI"):
-                                    play(first_turn)
-                                else:
-                                    return
-                            current_turn = "Player"
-                            print(f"AI moved to {knight_pos}")
+        self.background = screen.copy()
+
+        self.play_again_btn = Button(image=None, pos=(640, 400), text_input="PLAY AGAIN", font=get_font(75), base_color="White", hovering_color="#FFCA03")
+        self.exit_btn = Button(image=None, pos=(640, 550), text_input="EXIT", font=get_font(75), base_color="White", hovering_color="#CF3030")
+        self.win_back_btn = Button(image=None, pos=(1150, 50), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.play_again_btn, self.win_back_btn, self.exit_btn)
+        self.buttons.draw(screen, force=True)
+
+    def exit(self):
+        self.background = None
+        self.buttons = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.play_again_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(PlayScene(self.first_turn, self.size))
+            elif self.win_back_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(MenuScene())
+            elif self.exit_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.quit()
+
+    def update(self):
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        return self.buttons.draw(screen, self.background)
+
+# Play game scene
+class PlayScene(Scene):
+    def __init__(self, first_turn, size=None):
+        self.first_turn = first_turn
+        self.size = size or BOARD_SIZE
+
+    def enter(self, manager):
+        super().enter(manager)
+        first_turn = self.first_turn
+        self.board = get_board(self.size)
+        self.renderer = get_board_renderer(self.size)
+        self.state = random_start(random, PLAYER if first_turn == "Player" else AI, board=self.board)
+        self.knight_pos = self.board.to_pos(self.state.knight)
+        self.goal_pos = self.board.to_pos(self.state.goal)
+
+        self.current_turn = first_turn
+        self.start_square = self.state.knight
+        self.played = []
+        self.think_times = []
+        self.turn_started = time.perf_counter()
+        self.player_moves = [self.knight_pos] if first_turn == "Player" else []
+        self.ai_moves = [self.knight_pos] if first_turn == "AI" else []
+        self.goal_field = DistanceField(self.state.goal, self.state.visited, self.board)
+        self.ai_task = None
+        self.play_back = Button(image=None, pos=(1150, 50), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.play_back)
+        self.font = get_font(20)
+        self.thinking_rect = None
+        self.thinking_dots = None
+        self.pending_rects = []
+
+        # Everything except the pieces, buttons and thinking indicator is kept
+        # on a background surface that is only touched when a move is made
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill("black")
+        self.renderer.draw(self.background, self.player_moves, self.ai_moves)
+        self.background.blit(self.font.render("AI MOVES", True, "White"), (80, 130))
+        self.background.blit(self.font.render("PLAYER MOVES", True, "White"), (screen.get_width() - 220, 130))
+        for i in range(len(self.player_moves)):
+            self.list_move(self.player_moves, screen.get_width() - 150, i)
+        for i in range(len(self.ai_moves)):
+            self.list_move(self.ai_moves, 100, i)
+
+        screen.blit(self.background, (0, 0))
+        self.renderer.draw_piece(screen, assets.image("goal.png"), self.goal_pos)
+        self.renderer.draw_piece(screen, assets.image("p2.png"), self.knight_pos)
+        self.buttons.draw(screen, force=True)
+
+    def exit(self):
+        if self.ai_task is not None:
+            self.ai_task.cancel()
+            self.ai_task = None
+        self.background = None
+        self.buttons = None
+        self.goal_field = None
+
+    # Record the finished game if recording is on and show the winner
+    def finish(self, winner):
+        if record_writer is not None:
+            first_side = PLAYER if self.first_turn == "Player" else AI
+            record_writer.write(GameRecord(self.size, self.start_square, self.state.goal, first_side, self.played,
+                                           PLAYER if winner == "Player" else AI, self.think_times))
+            record_writer.flush()
+        self.manager.switch(WinScene(winner, self.first_turn, self.size))
+
+    # Add a move to the side's move list, returns the text's rectangle
+    def list_move(self, moves, x, i):
+        move_text = self.font.render(to_chess_notation(moves[i], self.size), True, "White")
+        return self.background.blit(move_text, (x, 180 + i * 25))
+
+    # Colour the new tile, list the move, clear the thinking indicator and
+    # move the knight. Returns the rectangles that changed.
+    def move_knight(self, new_pos, moves, tile_color, list_x):
+        self.state.play(self.board.to_square(new_pos))
+        now = time.perf_counter()
+        self.played.append(self.state.knight)
+        self.think_times.append(now - self.turn_started)
+        self.turn_started = now
+        self.goal_field.block(self.state.knight)
+        moves.append(new_pos)
+        rects = [self.renderer.draw_tile(self.background, new_pos, tile_color),
+                 self.list_move(moves, list_x, len(moves) - 1),
+                 self.renderer.tile_rect(self.knight_pos)]
+        if self.thinking_rect is not None:
+            rects.append(self.thinking_rect)
+            self.thinking_rect = None
+            self.thinking_dots = None
+        for rect in rects:
+            screen.blit(self.background, rect, rect)
+        self.renderer.draw_piece(screen, assets.image("goal.png"), self.goal_pos)
+        self.renderer.draw_piece(screen, assets.image("p2.png"), new_pos)
+        self.knight_pos = new_pos
+        play_sound("click.mp3")
+        return rects
+
+    def handle_event(self, event):
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            return
+        if self.play_back.checkInput(event.pos):
+            self.manager.switch(MenuScene())
+        elif self.current_turn == "Player":
+            board_pos = self.renderer.board_coords(event.pos)
+            if is_valid_knight_move(self.knight_pos, board_pos, self.state.visited, self.size):
+                self.pending_rects = self.move_knight(board_pos, self.player_moves, PLAYER_TILE, screen.get_width() - 150)
+                if self.knight_pos == self.goal_pos:
+                    self.finish("Player")
+                    return
+                self.current_turn = "AI"
+                print(f"Player moved to {self.knight_pos}")
+
+    def update(self):
+        dirty_rects, self.pending_rects = self.pending_rects, []
+
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        dirty_rects += self.buttons.draw(screen, self.background)
 
         # Check for no legal moves
-        player_legal_moves = [move for move in generate_knight_moves(knight_pos) if move not in all_moves]
-        if not player_legal_moves and current_turn == "Player":
-            if show_win_message("AI"):
-                play(first_turn)
-            else:
+        if not self.state.moves():
+            self.finish("AI" if self.current_turn == "Player" else "Player")
+            return dirty_rects
+
+        # AI turn: start a background search, then apply its move once done
+        if self.current_turn == "AI":
+            if self.ai_task is None:
+                make_searcher = functools.partial(get_ai_searcher, engine=AI_ENGINE, workers=AI_WORKERS, store=SOLVED_STORE)
+                self.ai_task = AIMoveTask(make_searcher, self.state, time_limit=AI_THINK_TIME, field=self.goal_field)
+            elif self.ai_task.done():
+                result = self.ai_task.result()
+                if instruments.enabled:
+                    instruments.observe("ai_move", self.ai_task.elapsed() * 1000)
+                self.ai_task = None
+                best_move = self.board.to_pos(result.move) if result.move is not None else None
+                if best_move and is_valid_knight_move(self.knight_pos, best_move, self.state.visited, self.size):
+                    dirty_rects += self.move_knight(best_move, self.ai_moves, AI_TILE, 100)
+                    if self.knight_pos == self.goal_pos:
+                        self.finish("AI")
+                        return dirty_rects
+                    self.current_turn = "Player"
+                    print(f"AI moved to {self.knight_pos} (depth {result.depth}, {result.nodes} nodes, {result.elapsed:.2f}s)")
+
+        # Thinking indicator, redrawn only when its dots change
+        dots = "." * (pygame.time.get_ticks() // 400 % 4) if self.ai_task is not None else None
+        if dots != self.thinking_dots:
+            if self.thinking_rect is not None:
+                screen.blit(self.background, self.thinking_rect, self.thinking_rect)
+                dirty_rects.append(self.thinking_rect)
+                self.thinking_rect = None
+            if dots is not None:
+                thinking_text = self.font.render(f"AI IS THINKING{dots}", True, "#FFC60B")
+                self.thinking_rect = screen.blit(thinking_text, (80, 80))
+                dirty_rects.append(self.thinking_rect)
+            self.thinking_dots = dots
+
+        return dirty_rects
+
+# Replays game `index` of a record corpus move by move. SPACE pauses, UP
+# and DOWN double or halve the speed, RIGHT steps one move and N goes on
+# to the next game.
+class ReplayScene(Scene):
+    def __init__(self, corpus, index=0, speed=1.0):
+        self.corpus = corpus
+        self.index = index
+        self.speed = speed
+
+    def enter(self, manager):
+        super().enter(manager)
+        self.record = self.corpus[self.index]
+        self.size = self.record.size
+        self.board = get_board(self.size)
+        self.renderer = get_board_renderer(self.size)
+        self.goal_pos = self.board.to_pos(self.record.goal)
+        self.knight_pos = self.board.to_pos(self.record.start)
+        self.side = self.record.first_side
+        self.next_move = 0
+        self.paused = False
+        self.last_move_ticks = pygame.time.get_ticks()
+        self.font = get_font(20)
+        self.status_rect = None
+
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill("black")
+        player_moves = [self.knight_pos] if self.side == PLAYER else []
+        ai_moves = [self.knight_pos] if self.side == AI else []
+        self.renderer.draw(self.background, player_moves, ai_moves)
+        self.background.blit(self.font.render(f"REPLAY {self.index + 1} OF {len(self.corpus)}", True, "White"), (80, 130))
+
+        screen.blit(self.background, (0, 0))
+        self.renderer.draw_piece(screen, assets.image("goal.png"), self.goal_pos)
+        self.renderer.draw_piece(screen, assets.image("p2.png"), self.knight_pos)
+        self.replay_back = Button(image=None, pos=(1150, 50), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.replay_back)
+        self.buttons.draw(screen, force=True)
+        self.pending_rects = [self.draw_status()]
+
+    def exit(self):
+        self.background = None
+        self.buttons = None
+
+    def done(self):
+        return self.next_move >= len(self.record.moves)
+
+    # Speed, pause state and, at the end, the winner, under the move list
+    def draw_status(self):
+        if self.done():
+            lines = [f"{'PLAYER' if self.record.winner == PLAYER else 'AI'} WINS"]
+        else:
+            lines = [f"MOVE {self.next_move + 1}/{len(self.record.moves)}", f"SPEED x{self.speed:g}"]
+            if self.paused:
+                lines.append("PAUSED")
+        rects = []
+        if self.status_rect is not None:
+            screen.blit(self.background, self.status_rect, self.status_rect)
+            rects.append(self.status_rect)
+        drawn = [screen.blit(self.font.render(line, True, "#FFC60B"), (80, 160 + i * 25)) for i, line in enumerate(lines)]
+        self.status_rect = drawn[0].unionall(drawn[1:])
+        rects.append(self.status_rect)
+        return rects[0].unionall(rects[1:])
+
+    # Play the next recorded move with the same tile colours as PlayScene
+    def step(self):
+        square = self.record.moves[self.next_move]
+        self.next_move += 1
+        new_pos = self.board.to_pos(square)
+        color = PLAYER_TILE if self.side == PLAYER else AI_TILE
+        self.side ^= 1
+        rects = [self.renderer.draw_tile(self.background, new_pos, color), self.renderer.tile_rect(self.knight_pos)]
+        for rect in rects:
+            screen.blit(self.background, rect, rect)
+        self.renderer.draw_piece(screen, assets.image("goal.png"), self.goal_pos)
+        self.renderer.draw_piece(screen, assets.image("p2.png"), new_pos)
+        self.knight_pos = new_pos
+        return rects
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.replay_back.checkInput(event.pos):
+                self.manager.switch(MenuScene())
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                self.paused = not self.paused
+            elif event.key == pygame.K_UP:
+                self.speed *= 2
+            elif event.key == pygame.K_DOWN:
+                self.speed /= 2
+            elif event.key == pygame.K_RIGHT and not self.done():
+                self.pending_rects += self.step()
+            elif event.key == pygame.K_n and self.index + 1 < len(self.corpus):
+                self.manager.switch(ReplayScene(self.corpus, self.index + 1, self.speed))
                 return
-
-        ai_legal_moves = [move for move in generate_knight_moves(knight_pos) if move not in all_moves]
-        if not ai_legal_moves and current_turn == "AI":
-            if show_win_message("Player"):
-                play(first_turn)
             else:
                 return
-
-        # label
-        font = get_font(20)
-        ai_label = font.render("AI MOVES", True, "White")
-        player_label = font.render("PLAYER MOVES", True, "White")
-
-        screen.blit(ai_label, (80, 130))
-        screen.blit(player_label, (screen.get_width() - 220, 130))
-        
-        font = get_font(20)
-        for i, move in enumerate(player_moves):
-            move_text = font.render(to_chess_notation(move), True, "White")
-            screen.blit(move_text, (screen.get_width() - 150, 180 + i * 25))
-
-        for i, move in enumerate(ai_moves):
-            move_text = font.render(to_chess_notation(move), True, "White")
-            screen.blit(move_text, (100, 180 + i * 25))
-
-        pygame.display.update()
-
-# Help function
-def help():
-    while True:
-        help_mouse_pos = pygame.mouse.get_pos()
-
+            self.pending_rects.append(self.draw_status())
+
+    def update(self):
+        dirty_rects, self.pending_rects = self.pending_rects, []
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        dirty_rects += self.buttons.draw(screen, self.background)
+
+        now = pygame.time.get_ticks()
+        if self.paused or self.done():
+            self.last_move_ticks = now
+        elif now - self.last_move_ticks >= REPLAY_MOVE_MS / self.speed:
+            self.last_move_ticks = now
+            dirty_rects += self.step()
+            dirty_rects.append(self.draw_status())
+        return dirty_rects
+
+# Help scene
+class HelpScene(Scene):
+    def enter(self, manager):
+        super().enter(manager)
         screen.fill("#F2EEE3")
 
         help_text = get_font(75).render("GAME RULES", True, "#4C3232")
         help_rect = help_text.get_rect(center=(640, 100))
         screen.blit(help_text, help_rect)
-        
+
         rules = [
             "Tiles that have been previously visited cannot be stepped on again.",
             "Each move must follow the knight's move pattern from chess.",
@@ -374,28 +436,32 @@ def help():
             rule_text = font.render(rule, True, "#8B7E74")
             rule_rect = rule_text.get_rect(center=(640, 200 + i * spacing))
             screen.blit(rule_text, rule_rect)
+        self.background = screen.copy()
 
         # Back Button
-        help_back = Button(image=None, pos=(640, 600), text_input="BACK", font=get_font(45), base_color="#F98903", hovering_color="#CF3030")
-        help_back.changeColor(help_mouse_pos)
-        help_back.update(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if help_back.checkInput(help_mouse_pos):
-                    click_sound.play()
-                    main_menu()
-
-        pygame.display.update()
-
-# Main menu
-def main_menu():
-    while True:
-        screen.blit(BG, (0, 0))
-        menu_mouse_pos = pygame.mouse.get_pos()
+        self.help_back = Button(image=None, pos=(640, 600), text_input="BACK", font=get_font(45), base_color="#F98903", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.help_back)
+        self.buttons.draw(screen, force=True)
+
+    def exit(self):
+        self.background = None
+        self.buttons = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.help_back.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(MenuScene())
+
+    def update(self):
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        return self.buttons.draw(screen, self.background)
+
+# Main menu scene
+class MenuScene(Scene):
+    def enter(self, manager):
+        super().enter(manager)
+        screen.blit(assets.image("bg.png", alpha=False), (0, 0))
 
         menu_text = get_font(100).render("First to", True, "#c06c00")
         menu_rect = menu_text.get_rect(center=(640, 100))
@@ -404,67 +470,130 @@ def main_menu():
         menu_text2 = get_font(100).render("Neigh Neigh", True, "#c06c00")
         menu_rect2 = menu_text2.get_rect(center=(640, 200))
         screen.blit(menu_text2, menu_rect2)
-        
-        play_btn = Button(image=pygame.image.load("asset/bt2.png"), pos=(640, 350), text_input="PLAY GAME", font=get_font(75), base_color="#c06c00", hovering_color="#FFC60B")
-        help_btn = Button(image=pygame.image.load("asset/bt1.png"), pos=(640, 500), text_input="HELP", font=get_font(75), base_color="#c06c00", hovering_color="#FDA769")
-        exit_btn = Button(image=pygame.image.load("asset/bt2.png"), pos=(640, 650), text_input="EXIT GAME", font=get_font(75), base_color="#c06c00", hovering_color="#CF3030")
-
-        screen.blit(menu_text, menu_rect)
-
-        for button in [play_btn, help_btn, exit_btn]:
-            button.changeColor(menu_mouse_pos)
-            button.update(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if play_btn.checkInput(menu_mouse_pos):
-                    click_sound.play()
-                    choose_first_player()
-                elif help_btn.checkInput(menu_mouse_pos):
-                    click_sound.play()
-                    help()
-                elif exit_btn.checkInput(menu_mouse_pos):
-                    click_sound.play()
-                    pygame.quit()
-                    sys.exit()
-
-        pygame.display.update()
-
-def choose_first_player():
-    while True:
+        self.background = screen.copy()
+
+        self.play_btn = Button(image=assets.image("bt2.png"), pos=(640, 350), text_input="PLAY GAME", font=get_font(75), base_color="#c06c00", hovering_color="#FFC60B")
+        self.help_btn = Button(image=assets.image("bt1.png"), pos=(640, 500), text_input="HELP", font=get_font(75), base_color="#c06c00", hovering_color="#FDA769")
+        self.exit_btn = Button(image=assets.image("bt2.png"), pos=(640, 650), text_input="EXIT GAME", font=get_font(75), base_color="#c06c00", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.play_btn, self.help_btn, self.exit_btn)
+        self.buttons.draw(screen, force=True)
+
+    def exit(self):
+        self.background = None
+        self.buttons = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.play_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(ChooseScene())
+            elif self.help_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(HelpScene())
+            elif self.exit_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.quit()
+
+    def update(self):
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        return self.buttons.draw(screen, self.background)
+
+# Choose who moves first
+class ChooseScene(Scene):
+    def enter(self, manager):
+        super().enter(manager)
         screen.fill("black")
         choose_text = get_font(75).render("Who moves first?", True, "White")
         choose_rect = choose_text.get_rect(center=(640, 100))
         screen.blit(choose_text, choose_rect)
-
-        player_first_btn = Button(image=None, pos=(640, 300), text_input="Player", font=get_font(75), base_color="White", hovering_color="#FFC60B")
-        ai_first_btn = Button(image=None, pos=(640, 400), text_input="AI", font=get_font(75), base_color="White", hovering_color="#FFC60B")
-        back_btn = Button(image=None, pos=(640, 550), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
-
-        mouse_pos = pygame.mouse.get_pos()
-
-        for button in [player_first_btn, ai_first_btn, back_btn]:
-            button.changeColor(mouse_pos)
-            button.update(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if player_first_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    play("Player")
-                elif ai_first_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    play("AI")
-                elif back_btn.checkInput(mouse_pos):
-                    click_sound.play()
-                    main_menu()
-
-        pygame.display.update()
-
-main_menu()
\ No newline at end of file
+        self.background = screen.copy()
+
+        self.player_first_btn = Button(image=None, pos=(640, 300), text_input="Player", font=get_font(75), base_color="White", hovering_color="#FFC60B")
+        self.ai_first_btn = Button(image=None, pos=(640, 400), text_input="AI", font=get_font(75), base_color="White", hovering_color="#FFC60B")
+        self.back_btn = Button(image=None, pos=(640, 550), text_input="BACK", font=get_font(75), base_color="White", hovering_color="#CF3030")
+        self.buttons = ButtonGroup(self.player_first_btn, self.ai_first_btn, self.back_btn)
+        self.buttons.draw(screen, force=True)
+
+    def exit(self):
+        self.background = None
+        self.buttons = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.player_first_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(PlayScene("Player"))
+            elif self.ai_first_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(PlayScene("AI"))
+            elif self.back_btn.checkInput(event.pos):
+                play_sound("click.mp3")
+                self.manager.switch(MenuScene())
+
+    def update(self):
+        self.buttons.changeColor(pygame.mouse.get_pos())
+        return self.buttons.draw(screen, self.background)
+
+# GUI entry point. Opens the window and runs the game from the main menu
+# until the window is closed or EXIT is clicked. `--frames N` quits after
+# N frames, which is used to time startup, `--board-size N` plays on an
+# NxN board and `--ai mcts` switches the AI to Monte Carlo tree search.
+# `--stats PATH` appends search and frame-time events to PATH as JSON
+# lines, and `--overlay` starts with the stats overlay shown (F3 toggles
+# it). `--record PATH` appends every finished game to a record corpus, and
+# `--replay PATH` opens on a replay of game `--game` of a corpus instead
+# of the menu.
+def main(argv=None):
+    global BOARD_SIZE, AI_ENGINE, AI_THINK_TIME, AI_WORKERS, record_writer
+    parser = argparse.ArgumentParser(description="First to Neigh Neigh")
+    parser.add_argument("--frames", type=int, default=None, help="quit after this many frames")
+    parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE,
+                        help=f"board width and height in tiles, {MIN_BOARD_SIZE} or more (default {DEFAULT_BOARD_SIZE})")
+    parser.add_argument("--ai", choices=("search", "mcts"), default=AI_ENGINE,
+                        help=f"AI engine: alpha-beta search or Monte Carlo tree search (default {AI_ENGINE})")
+    parser.add_argument("--workers", type=int, default=AI_WORKERS,
+                        help=f"processes for the AI turn, more than 1 searches in a process pool (default {AI_WORKERS})")
+    parser.add_argument("--think-time", type=float, default=AI_THINK_TIME,
+                        help=f"seconds the AI thinks per move (default {AI_THINK_TIME})")
+    parser.add_argument("--stats", metavar="PATH", default=None, help="append instrumentation events to PATH as JSON lines")
+    parser.add_argument("--overlay", action="store_true", help="show the stats overlay from the start (F3 toggles it)")
+    parser.add_argument("--record", metavar="PATH", default=None, help="append finished games to the record corpus at PATH")
+    parser.add_argument("--replay", metavar="PATH", default=None, help="replay games from the record corpus at PATH")
+    parser.add_argument("--game", type=int, default=0, help="game of the corpus to replay first (default 0)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1.0 is one move per half second")
+    args = parser.parse_args(argv)
+    if args.board_size < MIN_BOARD_SIZE:
+        parser.error(f"--board-size must be at least {MIN_BOARD_SIZE}")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.think_time <= 0:
+        parser.error("--think-time must be positive")
+
+    BOARD_SIZE = args.board_size
+    AI_ENGINE = args.ai
+    AI_THINK_TIME = args.think_time
+    AI_WORKERS = args.workers
+    corpus = RecordCorpus(args.replay) if args.replay else None
+    if corpus is not None and not 0 <= args.game < len(corpus):
+        parser.error(f"--game must be between 0 and {len(corpus) - 1}")
+    if args.stats:
+        instruments.enable(args.stats)
+    if args.record:
+        record_writer = RecordWriter(args.record)
+    init_display()
+    manager = SceneManager(screen, FPS)
+    if args.overlay:
+        manager.toggle_overlay()
+    manager.run(ReplayScene(corpus, args.game, args.speed) if corpus is not None else MenuScene(), max_frames=args.frames)
+    ai_worker.shutdown()
+    if args.stats:
+        instruments.event("assets", **assets.stats())
+        instruments.disable()
+    if record_writer is not None:
+        record_writer.close()
+    if corpus is not None:
+        corpus.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import pygame
+from assets import assets
+from engine.instrument import instruments
+
+OVERLAY_POS = (10, 10)
+OVERLAY_FONT_SIZE = 16
+OVERLAY_COLOR = (255, 255, 0)
+OVERLAY_BACKGROUND = (0, 0, 0)
+OVERLAY_REFRESH = 10  # frames between text updates
+
+# Stats box drawn over the top-left corner of whatever scene is showing.
+# The screen under the box is saved before drawing and put back at the
+# start of the next frame, so scenes never need to know about it. The text
+# is only re-rendered every OVERLAY_REFRESH frames.
+class StatsOverlay():
+    def __init__(self):
+        self.visible = False
+        self.surface = None
+        self.background = None
+        self.rect = None
+        self.frames = 0
+
+    # Forget the saved background, after a new scene has drawn the screen
+    def invalidate(self):
+        self.background = None
+        self.rect = None
+
+    # Put back what was under the box. Returns the rectangles touched.
+    def restore(self, screen):
+        if self.background is None:
+            return []
+        screen.blit(self.background, self.rect)
+        rect = self.rect
+        self.invalidate()
+        return [rect]
+
+    def _lines(self, scene_name):
+        lines = []
+        frame = instruments.histograms.get(f"frame.{scene_name}")
+        if frame is not None and frame.count:
+            lines.append(f"{scene_name}  frame p50 {frame.percentile(0.5):.1f} ms"
+                         f"  p99 {frame.percentile(0.99):.1f} ms  max {frame.max:.1f} ms")
+        work = instruments.histograms.get(f"frame_work.{scene_name}")
+        if work is not None and work.count:
+            lines.append(f"work p50 {work.percentile(0.5):.1f} ms  p99 {work.percentile(0.99):.1f} ms")
+        search = instruments.last.get("search")
+        if search is not None:
+            lines.append(f"AI {search['engine']}  {search['ms']:.0f} ms  depth {search['depth']}  nodes {search['nodes']}")
+        counters = instruments.counters
+        lines.append(f"TT hits {counters.get('alphabeta.tt_hits', 0)}  cutoffs {counters.get('alphabeta.cutoffs', 0)}"
+                     f"  A* expansions {counters.get('a_star.expansions', 0)}")
+        lines.append(f"asset cache hits {assets.hits}  misses {assets.misses}")
+        return lines
+
+    def _render(self, scene_name):
+        font = assets.font(OVERLAY_FONT_SIZE)
+        texts = [font.render(line, True, OVERLAY_COLOR) for line in self._lines(scene_name)]
+        width = max(text.get_width() for text in texts) + 8
+        height = sum(text.get_height() for text in texts) + 8
+        surface = pygame.Surface((width, height))
+        surface.fill(OVERLAY_BACKGROUND)
+        y = 4
+        for text in texts:
+            surface.blit(text, (4, y))
+            y += text.get_height()
+        return surface
+
+    # Draw the box on top of the frame. Returns the rectangles touched.
+    def draw(self, screen, scene_name):
+        if self.surface is None or self.frames % OVERLAY_REFRESH == 0:
+            self.surface = self._render(scene_name)
+        self.frames += 1
+        self.rect = self.surface.get_rect(topleft=OVERLAY_POS).clip(screen.get_rect())
+        self.background = screen.subsurface(self.rect).copy()
+        screen.blit(self.surface, self.rect)
+        return [self.rect]
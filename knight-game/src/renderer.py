@@ -0,0 +1,76 @@
+import pygame
+
+LIGHT_TILE = (200, 200, 200)
+DARK_TILE = (50, 50, 50)
+PLAYER_TILE = (255, 0, 0)  # Red for player moves
+AI_TILE = (0, 0, 255)  # Blue for AI moves
+
+MAX_TILE_SIZE = 80
+BOARD_MARGIN = 80  # space left above and below the board when fitting tiles
+
+# Draws the board from a checkerboard surface rendered once up front.
+# Visited tiles are painted over it one at a time, and every drawing call
+# returns the rectangle it touched so callers can update only those parts
+# of the display. Without a `tile_size` the tiles are sized so the whole
+# board fits the window, up to MAX_TILE_SIZE.
+class BoardRenderer():
+    def __init__(self, screen_size, board_size=8, tile_size=None):
+        if tile_size is None:
+            tile_size = max(1, min(MAX_TILE_SIZE, (min(screen_size) - BOARD_MARGIN) // board_size))
+        self.board_size = board_size
+        self.tile_size = tile_size
+        total = board_size * tile_size
+        self.offset_x = (screen_size[0] - total) // 2
+        self.offset_y = (screen_size[1] - total) // 2
+        self.rect = pygame.Rect(self.offset_x, self.offset_y, total, total)
+        self.checkerboard = self._render_checkerboard()
+        self.pieces = {}
+
+    def _render_checkerboard(self):
+        surface = pygame.Surface(self.rect.size)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(DARK_TILE)
+        for row in range(self.board_size):
+            for col in range(self.board_size):
+                if (row + col) % 2 == 0:
+                    surface.fill(LIGHT_TILE, (col * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size))
+        return surface
+
+    def tile_rect(self, pos):
+        return pygame.Rect(self.offset_x + pos[0] * self.tile_size, self.offset_y + pos[1] * self.tile_size,
+                           self.tile_size, self.tile_size)
+
+    # Whole board with the visited tiles coloured in
+    def draw(self, surface, player_moves, ai_moves):
+        surface.blit(self.checkerboard, self.rect)
+        for pos in ai_moves:
+            surface.fill(AI_TILE, self.tile_rect(pos))
+        for pos in player_moves:
+            surface.fill(PLAYER_TILE, self.tile_rect(pos))
+        return self.rect
+
+    def draw_tile(self, surface, pos, color):
+        rect = self.tile_rect(pos)
+        surface.fill(color, rect)
+        return rect
+
+    # Piece images are drawn for MAX_TILE_SIZE tiles. On smaller tiles they
+    # are scaled down by the same factor once and kept.
+    def draw_piece(self, surface, image, pos):
+        piece = self.pieces.get(image)
+        if piece is None:
+            piece = image
+            if self.tile_size != MAX_TILE_SIZE:
+                width, height = image.get_size()
+                size = (max(1, width * self.tile_size // MAX_TILE_SIZE), max(1, height * self.tile_size // MAX_TILE_SIZE))
+                scale = pygame.transform.smoothscale if image.get_bitsize() >= 24 else pygame.transform.scale
+                piece = scale(image, size)
+            self.pieces[image] = piece
+        rect = self.tile_rect(pos)
+        surface.blit(piece, rect)
+        return rect
+
+    # Board square under a pixel position, which may be off the board
+    def board_coords(self, pos):
+        return ((pos[0] - self.offset_x) // self.tile_size, (pos[1] - self.offset_y) // self.tile_size)
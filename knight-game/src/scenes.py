@@ -0,0 +1,127 @@
+import time
+import pygame
+from engine.instrument import instruments
+from overlay import StatsOverlay
+
+OVERLAY_KEY = pygame.K_F3
+
+# One screen of the game. The manager calls enter() when the scene becomes
+# active, then handle_event() for every event and update() once per frame,
+# and exit() when it switches away. enter() draws the whole screen, update()
+# returns the rectangles it changed, and exit() drops anything the scene
+# holds on to.
+class Scene():
+    def enter(self, manager):
+        self.manager = manager
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self):
+        return []
+
+
+# Runs the single game loop and swaps scenes on request. Switching takes
+# effect at the start of the next frame, so a scene can ask for a switch
+# from inside its own event handling.
+#
+# While instruments are enabled the time from the start of one frame to
+# the start of the next, waits and stalls included, goes to a
+# "frame.<scene class>" histogram, and frames longer than twice the frame
+# budget are logged as "frame_spike" events. The scene's own work, from
+# the start of event handling to the display update, goes to
+# "frame_work.<scene class>". OVERLAY_KEY shows or hides the stats overlay.
+class SceneManager():
+    def __init__(self, screen, fps=60):
+        self.screen = screen
+        self.fps = fps
+        self.scene = None
+        self.next_scene = None
+        self.running = False
+        self.clock = pygame.time.Clock()
+        self.overlay = StatsOverlay()
+        self.spike_ms = 2000 / fps
+
+    # Showing the overlay turns instruments on; hiding it turns them off
+    # again unless they are also writing to a file
+    def toggle_overlay(self):
+        overlay = self.overlay
+        overlay.visible = not overlay.visible
+        if overlay.visible:
+            instruments.enable()
+        else:
+            rects = overlay.restore(self.screen)
+            if rects:
+                pygame.display.update(rects)
+            if instruments.sink is None:
+                instruments.enabled = False
+
+    def switch(self, scene):
+        self.next_scene = scene
+
+    def quit(self):
+        self.running = False
+
+    def _activate_next(self):
+        if self.scene is not None:
+            self.scene.exit()
+        self.scene, self.next_scene = self.next_scene, None
+        self.overlay.invalidate()
+        self.scene.enter(self)
+        pygame.display.update()
+
+    # `max_frames` stops the loop after that many frames, None runs until quit
+    def run(self, scene, max_frames=None):
+        self.switch(scene)
+        self.running = True
+        frames = 0
+        previous = None
+        while self.running:
+            now = time.perf_counter()
+            if previous is not None and instruments.enabled and self.scene is not None:
+                self._record_interval((now - previous) * 1000)
+            previous = now
+            if self.next_scene is not None:
+                self._activate_next()
+
+            frame_start = time.perf_counter()
+            # Scenes may draw while handling events, so the overlay comes
+            # off before that
+            restored = self.overlay.restore(self.screen) if self.overlay.visible else []
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.quit()
+                    break
+                if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+                    self.toggle_overlay()
+                    continue
+                self.scene.handle_event(event)
+                if self.next_scene is not None or not self.running:
+                    break
+            if self.next_scene is not None or not self.running:
+                continue
+
+            dirty_rects = restored + list(self.scene.update())
+            if self.overlay.visible:
+                dirty_rects += self.overlay.draw(self.screen, type(self.scene).__name__)
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            if instruments.enabled:
+                instruments.observe(f"frame_work.{type(self.scene).__name__}", (time.perf_counter() - frame_start) * 1000)
+            self.clock.tick(self.fps)
+            frames += 1
+            if max_frames is not None and frames >= max_frames:
+                self.quit()
+
+        if self.scene is not None:
+            self.scene.exit()
+            self.scene = None
+
+    def _record_interval(self, ms):
+        name = type(self.scene).__name__
+        instruments.observe(f"frame.{name}", ms)
+        if ms > self.spike_ms:
+            instruments.event("frame_spike", scene=name, ms=round(ms, 3))
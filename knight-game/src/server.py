@@ -0,0 +1,388 @@
+# Multi-session game server
+#
+# Serves many games from one process over TCP or a Unix socket with a
+# JSON-lines protocol: one request object per line, one response per line.
+# The rules are the same as the game window's: the player and the AI move
+# the same knight over unvisited tiles, the first to land on the goal wins
+# and a side with no legal move loses.
+#
+#   {"op": "new", "first": "player" | "ai", "size": 8, "think_time": 0.1, "depth": 4}
+#   {"op": "move", "session": 1, "square": 42}
+#   {"op": "state", "session": 1}
+#   {"op": "close", "session": 1}
+#   {"op": "stats"}
+#
+# Every game response carries the session id, the knight and goal squares,
+# the legal moves of the player, the AI's reply ("ai_move") and the winner
+# once the game is over ("result"). Squares are y * size + x. Errors come
+# back as {"ok": false, "error": "..."}.
+#
+# AI turns go through a bounded queue to a shared process pool. When the
+# queue is full, connections wait for a free slot before reading their
+# next request, so load builds up as TCP back-pressure rather than
+# unbounded memory. Each session has its own think time and depth, capped
+# by the server's, and sessions idle for longer than --session-timeout
+# are dropped. If the pool fails to produce an AI move, the player's move
+# is taken back (or a game the AI was to open is dropped) and the request
+# gets an error.
+#
+#   python server.py --tcp 127.0.0.1:8765 --workers 4
+#   python server.py --unix /tmp/knight.sock --think-time 0.05
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.board import PLAYER, AI, DEFAULT_BOARD_SIZE, MIN_BOARD_SIZE, GameState, get_board, is_legal, squares
+from engine.openings import DIFFICULTIES, random_start
+from engine.search import Searcher
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+DEFAULT_THINK_TIME = 0.2  # seconds per AI move, the most a session may ask for
+DEFAULT_DEPTH = 4
+MAX_BOARD_SIZE = 64
+MAX_SESSIONS = 10000
+SESSION_TIMEOUT = 300.0  # seconds without a request before a session is dropped
+LATENCY_WINDOW = 10000  # recent move latencies kept for percentiles
+SIDE_LABELS = {PLAYER: "player", AI: "ai"}
+
+
+# Process pool workers keep one searcher each, reused across requests
+_worker_searcher = None
+
+def _init_worker():
+    global _worker_searcher
+    _worker_searcher = Searcher()
+
+def _ai_move(size, knight, goal, visited, depth, think_time):
+    state = GameState(knight, goal, visited, AI, get_board(size))
+    result = _worker_searcher.search(state, max_depth=depth, time_limit=think_time)
+    return result.move
+
+
+# Value at `fraction` of the way through the sorted `values`
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# "host:port" to (host, port)
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class RequestError(Exception):
+    pass
+
+
+class Session():
+    def __init__(self, session_id, state, think_time, depth):
+        self.id = session_id
+        self.state = state
+        self.think_time = think_time
+        self.depth = depth
+        self.winner = None
+        self.busy = False
+        self.last_active = time.monotonic()
+
+    # Settle the turn: a side with no legal move loses
+    def check_stuck(self):
+        if self.winner is None and not self.state.moves():
+            self.winner = self.state.side ^ 1
+
+    def play(self, square):
+        self.state.play(square)
+        if self.state.is_won():
+            self.winner = self.state.side ^ 1
+        else:
+            self.check_stuck()
+
+    def view(self):
+        state = self.state
+        return {
+            "ok": True,
+            "session": self.id,
+            "size": state.board.size,
+            "knight": state.knight,
+            "goal": state.goal,
+            "moves": list(squares(state.moves())) if self.winner is None else [],
+            "result": SIDE_LABELS[self.winner] if self.winner is not None else None,
+        }
+
+
+class GameServer():
+    def __init__(self, workers=None, think_time=DEFAULT_THINK_TIME, depth=DEFAULT_DEPTH, queue_size=None,
+                 max_sessions=MAX_SESSIONS, session_timeout=SESSION_TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.think_time = think_time
+        self.depth = depth
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.queue = asyncio.Queue(queue_size or 4 * self.workers)
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.rng = random.Random()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.monotonic()
+        self.sessions_started = 0
+        self.sessions_finished = 0
+        self.sessions_expired = 0
+        self.ai_failures = 0
+        self.moves = 0
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._expire_sessions()))
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    # One dispatcher per worker moves AI requests from the queue to the pool
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            args, future = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.pool, _ai_move, *args)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _expire_sessions(self):
+        while True:
+            await asyncio.sleep(min(self.session_timeout, 1.0))
+            cutoff = time.monotonic() - self.session_timeout
+            for session_id in [sid for sid, session in self.sessions.items()
+                               if session.last_active < cutoff and not session.busy]:
+                del self.sessions[session_id]
+                self.sessions_expired += 1
+
+    async def _ai_turn(self, session):
+        state = session.state
+        future = asyncio.get_running_loop().create_future()
+        # Waits here while the queue is full
+        await self.queue.put(((state.board.size, state.knight, state.goal, state.visited, session.depth,
+                               session.think_time), future))
+        move = await future
+        session.play(move)
+        return move
+
+    def _finish(self, session, response):
+        if session.winner is not None:
+            self.sessions.pop(session.id, None)
+            self.sessions_finished += 1
+        return response
+
+    def _session(self, request):
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            raise RequestError("unknown session")
+        if session.busy:
+            raise RequestError("session is busy")
+        session.last_active = time.monotonic()
+        return session
+
+    async def new_game(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise RequestError("too many sessions")
+        first = request.get("first", "player")
+        if first not in ("player", "ai"):
+            raise RequestError("first must be 'player' or 'ai'")
+        size = int(request.get("size", DEFAULT_BOARD_SIZE))
+        if not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+            raise RequestError(f"size must be between {MIN_BOARD_SIZE} and {MAX_BOARD_SIZE}")
+        difficulty = request.get("difficulty")
+        if difficulty is not None and difficulty not in DIFFICULTIES:
+            raise RequestError(f"difficulty must be one of {DIFFICULTIES}")
+        think_time = max(0.0, min(float(request.get("think_time", self.think_time)), self.think_time))
+        depth = max(1, min(int(request.get("depth", self.depth)), self.depth))
+
+        state = random_start(self.rng, PLAYER if first == "player" else AI, difficulty, get_board(size))
+        session = Session(next(self.ids), state, think_time, depth)
+        self.sessions[session.id] = session
+        self.sessions_started += 1
+        response = session.view()
+        if state.side == AI:
+            session.busy = True
+            try:
+                session.check_stuck()
+                if session.winner is None:
+                    response["ai_move"] = await self._ai_turn(session)
+            except Exception as error:
+                self.sessions.pop(session.id, None)
+                self.ai_failures += 1
+                raise RequestError(f"AI move failed, session dropped: {error!r}") from error
+            finally:
+                session.busy = False
+            response.update(session.view())
+        return self._finish(session, response)
+
+    async def move(self, request):
+        session = self._session(request)
+        if session.winner is not None or session.state.side != PLAYER:
+            raise RequestError("not the player's turn")
+        square = request.get("square")
+        state = session.state
+        if (not isinstance(square, int) or not 0 <= square < state.board.num_squares
+                or not is_legal(state.knight, square, state.visited, state.board)):
+            raise RequestError("illegal move")
+
+        started = time.perf_counter()
+        before = state.copy()
+        session.busy = True
+        try:
+            session.play(square)
+            response = {}
+            if session.winner is None:
+                response["ai_move"] = await self._ai_turn(session)
+        except Exception as error:
+            # Take the player's move back so the session is theirs to move again
+            session.state = before
+            session.winner = None
+            self.ai_failures += 1
+            raise RequestError(f"AI move failed, move taken back: {error!r}") from error
+        finally:
+            session.busy = False
+        self.moves += 1
+        self.latencies.append(time.perf_counter() - started)
+        response.update(session.view())
+        return self._finish(session, response)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        return {
+            "ok": True,
+            "uptime": elapsed,
+            "active_sessions": len(self.sessions),
+            "sessions_started": self.sessions_started,
+            "sessions_finished": self.sessions_finished,
+            "sessions_expired": self.sessions_expired,
+            "ai_failures": self.ai_failures,
+            "sessions_per_sec": self.sessions_finished / elapsed if elapsed > 0 else 0.0,
+            "moves": self.moves,
+            "move_p50_ms": 1000 * percentile(latencies, 0.5),
+            "move_p99_ms": 1000 * percentile(latencies, 0.99),
+            "queued": self.queue.qsize(),
+            "workers": self.workers,
+        }
+
+    async def handle_request(self, request):
+        op = request.get("op")
+        if op == "new":
+            return await self.new_game(request)
+        if op == "move":
+            return await self.move(request)
+        if op == "state":
+            return self._session(request).view()
+        if op == "close":
+            session = self._session(request)
+            del self.sessions[session.id]
+            return {"ok": True, "session": session.id}
+        if op == "stats":
+            return self.stats()
+        raise RequestError(f"unknown op {op!r}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise RequestError("request must be a JSON object")
+                    response = await self.handle_request(request)
+                except (RequestError, ValueError, TypeError, OverflowError) as error:
+                    response = {"ok": False, "error": str(error)}
+                except Exception as error:
+                    response = {"ok": False, "error": f"internal error: {error!r}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def format_stats(stats):
+    return (f"{stats['active_sessions']} active, {stats['sessions_finished']} finished "
+            f"({stats['sessions_per_sec']:.1f} sessions/sec), {stats['moves']} moves, "
+            f"p50 {stats['move_p50_ms']:.1f} ms, p99 {stats['move_p99_ms']:.1f} ms, {stats['queued']} queued")
+
+async def _report(server, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(format_stats(server.stats()), flush=True)
+
+async def serve(args):
+    server = GameServer(workers=args.workers, think_time=args.think_time, depth=args.depth,
+                        queue_size=args.queue_size, max_sessions=args.max_sessions,
+                        session_timeout=args.session_timeout)
+    server.start()
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=args.unix)
+        where = args.unix
+    else:
+        host, port = parse_address(args.tcp)
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        where = f"{host}:{port}"
+    print(f"serving on {where} with {server.workers} AI workers", flush=True)
+    reporter = asyncio.create_task(_report(server, args.report)) if args.report > 0 else None
+    try:
+        async with listener:
+            if args.duration is not None:
+                await asyncio.sleep(args.duration)
+            else:
+                await listener.serve_forever()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        print(format_stats(server.stats()), flush=True)
+        await server.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve knight games over a JSON-lines socket.")
+    parser.add_argument("--tcp", metavar="HOST:PORT", default=DEFAULT_ADDRESS)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="AI processes (default: all cores)")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME,
+                        help=f"longest AI think time per move in seconds (default {DEFAULT_THINK_TIME})")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH,
+                        help=f"deepest AI search in plies (default {DEFAULT_DEPTH})")
+    parser.add_argument("--queue-size", type=int, default=None, help="pending AI moves before clients wait (default 4 per worker)")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--session-timeout", type=float, default=SESSION_TIMEOUT,
+                        help=f"seconds of inactivity before a session is dropped (default {SESSION_TIMEOUT:g})")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between stats lines, 0 for none")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
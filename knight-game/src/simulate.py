@@ -0,0 +1,294 @@
+# Headless self-play runner
+#
+# Plays games between two players with the same rules as play(): visited
+# tiles are blocked, the first side to land on the goal wins and a side
+# with no legal move loses. Games are spread over a process pool, and
+# every game is seeded from (--seed, game index) so a run can be repeated
+# exactly.
+#
+#   python simulate.py --games 2000 --player-a search:depth=4 --player-b greedy
+#   python simulate.py --games 2000 --difficulty far
+#   python simulate.py --games 200 --board-size 20 --player-a greedy
+#   python simulate.py --games 200 --player-a mcts:time=0.02 --player-b mcts:time=0.005
+#   python simulate.py --games 100000 --record ../selfplay.bin
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.board import PLAYER, AI, DEFAULT_BOARD_SIZE, MIN_BOARD_SIZE, get_board, squares
+from engine.openings import DIFFICULTIES, random_start
+from engine.pathfind import UNREACHABLE, goal_distance
+from engine.search import Searcher
+from engine.mcts import MCTSSearcher
+from engine.record import GameRecord, RecordWriter
+from engine.solver import Solver, SolvedSearcher
+
+DEFAULT_SEARCH_DEPTH = 4  # used when a search player has no depth, time or node budget
+
+
+class RandomPlayer():
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, state):
+        return self.rng.choice(list(squares(state.moves())))
+
+
+# Takes the goal when it can, otherwise the move with the shortest
+# remaining path. Ties are broken at random.
+class GreedyPlayer():
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, state):
+        moves = state.moves()
+        if (moves >> state.goal) & 1:
+            return state.goal
+        best = []
+        best_distance = None
+        for square in squares(moves):
+            distance = goal_distance(square, state.goal, state.visited | (1 << square), state.board)
+            distance = UNREACHABLE if distance is None else distance
+            if best_distance is None or distance < best_distance:
+                best, best_distance = [square], distance
+            elif distance == best_distance:
+                best.append(square)
+        return self.rng.choice(best)
+
+
+# Alpha-beta search, optionally answering endgames with at most `solve`
+# reachable squares exactly. Without any budget it searches to
+# DEFAULT_SEARCH_DEPTH rather than the searcher's MAX_DEPTH.
+class SearchPlayer():
+    def __init__(self, depth=None, time_limit=None, node_limit=None, solve=None):
+        if depth is None and time_limit is None and node_limit is None:
+            depth = DEFAULT_SEARCH_DEPTH
+        self.depth = depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.searcher = Searcher()
+        self.solve = solve
+        self.solvers = {}
+
+    def _searcher(self, state):
+        if self.solve is None:
+            return self.searcher
+        solver = self.solvers.get(state.board.size)
+        if solver is None:
+            solver = self.solvers[state.board.size] = Solver(state.board, self.solve)
+        return SolvedSearcher(solver, self.searcher)
+
+    def choose(self, state):
+        kwargs = {"time_limit": self.time_limit, "node_limit": self.node_limit}
+        if self.depth is not None:
+            kwargs["max_depth"] = self.depth
+        return self._searcher(state).search(state, **kwargs).move
+
+
+# Monte Carlo tree search with a time or iteration budget per move. One
+# searcher plays the whole game, so its tree carries over between moves.
+class MCTSPlayer():
+    def __init__(self, rng, time_limit=None, iterations=None, rollout="random"):
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.searcher = MCTSSearcher(rollout=rollout, seed=rng.getrandbits(64))
+
+    def choose(self, state):
+        return self.searcher.search(state, time_limit=self.time_limit, node_limit=self.iterations).move
+
+
+# Build a player from a spec such as "random", "greedy", "search:depth=4",
+# "search:time=0.05,nodes=20000", "search:depth=4,solve=20" or
+# "mcts:time=0.05,rollout=greedy"
+def make_player(spec, rng):
+    name, _, options = spec.partition(":")
+    settings = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        settings[key.strip()] = value.strip()
+
+    if name == "random":
+        return RandomPlayer(rng)
+    if name == "greedy":
+        return GreedyPlayer(rng)
+    if name == "search":
+        return SearchPlayer(depth=int(settings["depth"]) if "depth" in settings else None,
+                            time_limit=float(settings["time"]) if "time" in settings else None,
+                            node_limit=int(settings["nodes"]) if "nodes" in settings else None,
+                            solve=int(settings["solve"]) if "solve" in settings else None)
+    if name == "mcts":
+        return MCTSPlayer(rng, time_limit=float(settings["time"]) if "time" in settings else None,
+                          iterations=int(settings["iters"]) if "iters" in settings else None,
+                          rollout=settings.get("rollout", "random"))
+    raise ValueError(f"Unknown player spec: {spec}")
+
+def validate_spec(spec):
+    make_player(spec, random.Random(0))
+    return spec
+
+
+# Play one game. `players` is indexed by side (PLAYER, AI). Returns the
+# winning side, the squares played and the think time of every move.
+def play_game(state, players):
+    moves = []
+    think_times = []
+    while True:
+        if not state.moves():
+            return state.side ^ 1, moves, think_times
+        mover = state.side
+        start = time.perf_counter()
+        square = players[mover].choose(state)
+        think_times.append(time.perf_counter() - start)
+        state.play(square)
+        moves.append(square)
+        if state.knight == state.goal:
+            return mover, moves, think_times
+
+
+# Run games [first, last) of a tournament. The two seats of play() are not
+# symmetric: the opening colours decide which side can ever land on the
+# goal. So the players swap seats every game, and who moves first flips
+# every two games, with the opening following play()'s rule for whoever
+# moves first. With `record` each result also carries the game encoded as
+# a GameRecord, otherwise None.
+def run_games(player_specs, seed, first, last, difficulty=None, size=DEFAULT_BOARD_SIZE, record=False):
+    board = get_board(size)
+    results = []
+    for index in range(first, last):
+        rng = random.Random(f"{seed}:{index}")
+        a_side = PLAYER if index % 2 == 0 else AI
+        players = [None, None]
+        players[a_side] = make_player(player_specs[0], rng)
+        players[a_side ^ 1] = make_player(player_specs[1], rng)
+        first_side = PLAYER if index // 2 % 2 == 0 else AI
+
+        state = random_start(rng, first_side, difficulty, board)
+        data = None
+        if record:
+            start, goal = state.knight, state.goal
+        winner, moves, think_times = play_game(state, players)
+        if record:
+            data = GameRecord(size, start, goal, first_side, moves, winner, think_times).to_bytes()
+
+        # Moves alternate starting with the first side
+        a_times = think_times[0::2] if first_side == a_side else think_times[1::2]
+        b_times = think_times[1::2] if first_side == a_side else think_times[0::2]
+        results.append((index, 0 if winner == a_side else 1, len(moves), a_times, b_times, data))
+    return results
+
+
+def _summarise_times(times):
+    if not times:
+        return {"moves": 0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {"moves": len(times), "mean_ms": 1000 * sum(times) / len(times), "max_ms": 1000 * max(times)}
+
+# Play `games` games and summarise them. With `record_path` every game is
+# also appended to that record corpus, in game order.
+def run_tournament(player_specs, games, workers=None, seed=0, chunk_size=None, difficulty=None,
+                   size=DEFAULT_BOARD_SIZE, record_path=None):
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(100, games // (workers * 4) or 1))
+    chunks = [(first, min(first + chunk_size, games)) for first in range(0, games, chunk_size)]
+
+    record = record_path is not None
+    writer = RecordWriter(record_path) if record else None
+    results = []
+
+    # Chunks come back in game order, so records are written as they arrive
+    # and not kept
+    def collect(chunk):
+        for result in chunk:
+            if writer is not None:
+                writer.write_bytes(result[-1])
+            results.append(result[:-1])
+
+    start = time.perf_counter()
+    try:
+        if workers == 1:
+            for first, last in chunks:
+                collect(run_games(player_specs, seed, first, last, difficulty, size, record))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_games, player_specs, seed, first, last, difficulty, size, record)
+                           for first, last in chunks]
+                for future in futures:
+                    collect(future.result())
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    results.sort()
+    wins = [0, 0]
+    lengths = 0
+    times = ([], [])
+    for _, winner, length, a_times, b_times in results:
+        wins[winner] += 1
+        lengths += length
+        times[0].extend(a_times)
+        times[1].extend(b_times)
+
+    return {
+        "players": list(player_specs),
+        "games": games,
+        "seed": seed,
+        "difficulty": difficulty,
+        "board_size": size,
+        "workers": workers,
+        "wins": wins,
+        "win_rate": [count / games if games else 0.0 for count in wins],
+        "average_length": lengths / games if games else 0.0,
+        "think_time": [_summarise_times(times[0]), _summarise_times(times[1])],
+        "elapsed": elapsed,
+        "games_per_sec": games / elapsed if elapsed > 0 else 0.0,
+    }
+
+def print_report(report, out=sys.stdout):
+    openings = f", {report['difficulty']} openings" if report.get("difficulty") else ""
+    size = report.get("board_size", DEFAULT_BOARD_SIZE)
+    print(f"{report['games']} games on {size}x{size}, seed {report['seed']}, {report['workers']} workers{openings}",
+          file=out)
+    for label, spec, wins, rate, think in zip("AB", report["players"], report["wins"], report["win_rate"], report["think_time"]):
+        print(f"  {label} {spec:<28} wins {wins:>7}  ({rate:6.1%})  think {think['mean_ms']:8.3f} ms avg"
+              f"  {think['max_ms']:8.3f} ms max", file=out)
+    print(f"  average game length {report['average_length']:.2f} moves", file=out)
+    print(f"  {report['elapsed']:.2f}s total, {report['games_per_sec']:.1f} games/sec", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless knight games between two players.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--player-a", type=validate_spec, default="search:depth=4")
+    parser.add_argument("--player-b", type=validate_spec, default="random")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default=None,
+                        help="only start from openings in this bucket (default: any opening)")
+    parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE,
+                        help=f"board width and height, {MIN_BOARD_SIZE} or more (default {DEFAULT_BOARD_SIZE})")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON to PATH ('-' for stdout)")
+    parser.add_argument("--record", metavar="PATH", help="append every game to the record corpus at PATH")
+    args = parser.parse_args(argv)
+    if args.board_size < MIN_BOARD_SIZE:
+        parser.error(f"--board-size must be at least {MIN_BOARD_SIZE}")
+
+    report = run_tournament((args.player_a, args.player_b), args.games, workers=args.workers, seed=args.seed,
+                            difficulty=args.difficulty, size=args.board_size, record_path=args.record)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# Build or extend the store of solved endgame positions
+#
+# Plays random games from play()'s openings until the knight's reachable
+# region is small enough for the solver, then solves that position, which
+# also solves every position reachable from it. All results are merged
+# into the store file, which the game memory-maps at startup.
+#
+#   python solve.py --store ../solved.bin --games 5000 --threshold 20
+#   python solve.py --store ../solved.bin --lookup
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from engine.board import DEFAULT_BOARD_SIZE, MIN_BOARD_SIZE, get_board, squares
+from engine.openings import random_start
+from engine.solver import DEFAULT_THRESHOLD, Solver, SolvedStore
+
+
+def build(path, games, threshold, seed, size):
+    board = get_board(size)
+    store = SolvedStore(path) if os.path.exists(path) else None
+    solver = Solver(board, threshold, store)
+    start = time.perf_counter()
+    solved = 0
+    for index in range(games):
+        rng = random.Random(f"{seed}:{index}")
+        state = random_start(rng, index % 2, board=board)
+        while state.moves() and not state.is_won():
+            if solver.solve(state) is not None:
+                solved += 1
+                break
+            state.play(rng.choice(list(squares(state.moves()))))
+    elapsed = time.perf_counter() - start
+    if store is not None:
+        store.close()
+    count = solver.save(path)
+    print(f"{solved} of {games} games reached a solvable region, {solver.nodes} positions searched in {elapsed:.2f}s")
+    print(f"{path}: {count} positions, {os.path.getsize(path)} bytes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve small endgames exactly and store the results.")
+    parser.add_argument("--store", required=True, metavar="PATH", help="store file to create or extend")
+    parser.add_argument("--games", type=int, default=1000, help="random games to take endgames from")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"largest reachable region to solve (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE)
+    parser.add_argument("--lookup", action="store_true", help="only print what the store holds")
+    args = parser.parse_args(argv)
+    if args.board_size < MIN_BOARD_SIZE:
+        parser.error(f"--board-size must be at least {MIN_BOARD_SIZE}")
+
+    if args.lookup:
+        with SolvedStore(args.store) as store:
+            print(f"{args.store}: {len(store)} positions on {store.size}x{store.size}, threshold {store.threshold}")
+        return 0
+
+    build(args.store, args.games, args.threshold, args.seed, args.board_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())